@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from statistics import mean
+from time import perf_counter
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Seed a synthetic catalog and measure API latency")
+    parser.add_argument("--database-url", help="Sync SQLAlchemy URL, defaults to a temporary SQLite file")
+    parser.add_argument("--async-database-url", help="Async SQLAlchemy URL matching --database-url")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the app in-process")
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--authors", type=int, default=300)
+    parser.add_argument("--genres", type=int, default=30)
+    parser.add_argument("--publishers", type=int, default=30)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_output.json")
+    return parser.parse_args()
+
+def configure_database(args):
+    if not args.database_url:
+        path = Path(tempfile.gettempdir()) / "rest_example_bench.db"
+        path.unlink(missing_ok=True)
+        args.database_url = f"sqlite:///{path}"
+        args.async_database_url = f"sqlite+aiosqlite:///{path}"
+    if not args.async_database_url:
+        raise SystemExit("--async-database-url is required together with --database-url")
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["ASYNC_DATABASE_URL"] = args.async_database_url
+    os.environ.setdefault("DB_ECHO", "false")
+    os.environ.setdefault("MAX_SESSIONS_PER_USER", "0")
+    sys.path.insert(0, str(SRC_DIR))
+
+def seed_catalog(args, run_id):
+    from sqlalchemy import insert
+    from sqlmodel import Session, select
+
+    from db import create_db_and_tables, engine
+    from orm.author import Author
+    from orm.book import Book
+    from orm.book_author import BookAuthor
+    from orm.book_genre import BookGenre
+    from orm.comment import Comment
+    from orm.genre import Genre
+    from orm.publisher import Publisher
+    from orm.report import Report
+    from orm.user import Role, User
+    from passwords import password_hasher
+    from ratings import recompute_book_ratings
+
+    create_db_and_tables()
+    rng = random.Random(args.seed)
+    now = datetime.now()
+
+    def insert_rows(session, model, rows):
+        if not rows:
+            return []
+        return session.exec(
+            insert(model).returning(model.id, sort_by_parameter_order=True),
+            params=rows
+        ).scalars().all()
+
+    with Session(engine) as session:
+        password = password_hasher.hash("password")
+        users = [
+            {
+                "first_name": "Bench",
+                "last_name": f"User {i}",
+                "email": f"bench-{run_id}-{i}@example.com",
+                "password": password,
+                "joined_at": now,
+                "role": Role.MODERATOR if i == 0 else Role.USER,
+                "is_active": True
+            }
+            for i in range(args.users)
+        ]
+        user_ids = insert_rows(session, User, users)
+        publisher_ids = insert_rows(session, Publisher, [
+            { "name": f"Publisher {i}", "created_at": now } for i in range(args.publishers)
+        ])
+        author_ids = insert_rows(session, Author, [
+            { "first_name": f"First {i}", "last_name": f"Last {i}", "created_at": now } for i in range(args.authors)
+        ])
+        genre_ids = insert_rows(session, Genre, [{ "name": f"Genre {i}" } for i in range(args.genres)])
+        book_ids = insert_rows(session, Book, [
+            {
+                "title": f"Book {i}",
+                "publication_year": rng.randint(1900, 2025),
+                "page_count": rng.randint(50, 1200),
+                "description": "Lorem ipsum " * rng.randint(5, 50),
+                "publisher_id": rng.choice(publisher_ids),
+                "created_at": now
+            }
+            for i in range(args.books)
+        ])
+        session.exec(insert(BookAuthor), params=[
+            { "book_id": book_id, "author_id": author_id }
+            for book_id in book_ids for author_id in set(rng.sample(author_ids, rng.randint(1, 3)))
+        ])
+        session.exec(insert(BookGenre), params=[
+            { "book_id": book_id, "genre_id": genre_id }
+            for book_id in book_ids for genre_id in set(rng.sample(genre_ids, rng.randint(1, 2)))
+        ])
+        comment_ids = insert_rows(session, Comment, [
+            {
+                "book_id": rng.choice(book_ids),
+                "user_id": rng.choice(user_ids),
+                "comment_text": "Synthetic comment",
+                "rating": rng.randint(1, 5),
+                "created_at": now,
+                "is_approved": rng.random() < 0.8
+            }
+            for _ in range(args.comments)
+        ])
+        insert_rows(session, Report, [
+            {
+                "comment_id": comment_id,
+                "user_id": rng.choice(user_ids),
+                "reason_text": "Synthetic report",
+                "created_at": now
+            }
+            for comment_id in rng.sample(comment_ids, min(len(comment_ids), 100))
+        ])
+        recompute_book_ratings(session.connection())
+        session.commit()
+
+        unapproved_ids = session.exec(
+            select(Comment.id).where(Comment.id.in_(comment_ids), Comment.is_approved == False)
+        ).all()
+
+    return {
+        "emails": [user["email"] for user in users],
+        "book_ids": book_ids,
+        "unapproved_comment_ids": list(unapproved_ids)
+    }
+
+async def run_scenario(client, make_request, count, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(count):
+        queue.put_nowait(i)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            i = queue.get_nowait()
+            started_at = perf_counter()
+            response = await make_request(client, i)
+            latencies.append(perf_counter() - started_at)
+            if response.status_code >= 400:
+                errors += 1
+
+    started_at = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - started_at
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed, 2),
+        "mean_ms": round(mean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(0.50), 3),
+        "p99_ms": round(percentile(0.99), 3)
+    }
+
+async def run_benchmark(args, catalog):
+    import httpx
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url)
+    else:
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    rng = random.Random(args.seed)
+    emails = catalog["emails"]
+    book_ids = catalog["book_ids"]
+    unapproved_ids = catalog["unapproved_comment_ids"] or [0]
+
+    async with client:
+        tokens = []
+        for email in emails[:args.concurrency + 1]:
+            response = await client.post("/login", data={ "username": email, "password": "password" })
+            response.raise_for_status()
+            tokens.append(response.json()["access_token"])
+        moderator_headers = { "Authorization": f"Bearer {tokens[0]}" }
+        user_headers = [{ "Authorization": f"Bearer {token}" } for token in tokens[1:]] or [moderator_headers]
+
+        async def login(client, i):
+            return await client.post("/login", data={ "username": emails[i % len(emails)], "password": "password" })
+
+        async def get_books(client, i):
+            return await client.get(
+                "/books",
+                params={ "offset": rng.randrange(max(len(book_ids) - 10, 1)) },
+                headers=user_headers[i % len(user_headers)]
+            )
+
+        async def post_comment(client, i):
+            return await client.post(
+                f"/books/{rng.choice(book_ids)}/comments",
+                json={ "comment_text": "Benchmark comment", "rating": rng.randint(1, 5) },
+                headers=user_headers[i % len(user_headers)]
+            )
+
+        async def list_reports(client, i):
+            return await client.get("/reports/", headers=moderator_headers)
+
+        async def approve_comment(client, i):
+            return await client.post(f"/comments/{unapproved_ids[i % len(unapproved_ids)]}/approve", headers=moderator_headers)
+
+        scenarios = [
+            ("login", login),
+            ("get_books", get_books),
+            ("post_comment", post_comment),
+            ("list_reports", list_reports),
+            ("approve_comment", approve_comment)
+        ]
+        results = {}
+        for name, make_request in scenarios:
+            result = await run_scenario(client, make_request, args.requests, args.concurrency)
+            results[name] = result
+            print(f"{name:16} {result['throughput_rps']:>9} rps  p50 {result['p50_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  errors {result['errors']}")
+
+    from db import async_engine
+    await async_engine.dispose()
+    return results
+
+def main():
+    args = parse_args()
+    configure_database(args)
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+
+    started_at = perf_counter()
+    catalog = seed_catalog(args, run_id)
+    seed_seconds = perf_counter() - started_at
+    results = asyncio.run(run_benchmark(args, catalog))
+
+    report = {
+        "run_id": run_id,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": args.database_url.split(":", 1)[0],
+            "target": args.base_url or "in-process"
+        },
+        "dataset": {
+            "books": args.books,
+            "authors": args.authors,
+            "genres": args.genres,
+            "publishers": args.publishers,
+            "users": args.users,
+            "comments": args.comments,
+            "seed": args.seed,
+            "seed_seconds": round(seed_seconds, 3)
+        },
+        "load": { "requests": args.requests, "concurrency": args.concurrency },
+        "results": results
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
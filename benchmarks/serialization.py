@@ -0,0 +1,112 @@
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime
+from pathlib import Path
+from timeit import repeat
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare serialization cost of a GET /books page")
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--authors", type=int, default=2, help="Authors per book")
+    parser.add_argument("--comments", type=int, default=3, help="Comment preview size")
+    parser.add_argument("--description-length", type=int, default=2000)
+    parser.add_argument("--number", type=int, default=200, help="Pages serialized per measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="serialization_output.json")
+    return parser.parse_args()
+
+def build_page(args, page_size):
+    from orm.author import Author
+    from orm.book import Book
+    from orm.comment import Comment
+    from orm.publisher import Publisher
+
+    now = datetime.now()
+    publisher = Publisher(id=1, name="Publisher", address="Street 1", phone="123", created_at=now)
+    page = []
+    for i in range(page_size):
+        book = Book(
+            id=i + 1, title=f"Book {i}", publication_year=2000, page_count=300,
+            description="x" * args.description_length, image_url=f"https://example.com/{i}.png",
+            publisher_id=publisher.id, created_at=now, average_rating=4.2, rating_count=10, rating_sum=42,
+            approved_comment_count=10
+        )
+        book_dict = book.model_dump(exclude={"rating_sum"})
+        book_dict["authors"] = [
+            Author(id=j + 1, first_name="First", last_name=f"Last {j}", biography="Bio", created_at=now).model_dump()
+            for j in range(args.authors)
+        ]
+        book_dict["comments"] = [
+            Comment(
+                id=j + 1, book_id=book.id, user_id=1, comment_text="Comment", rating=4,
+                created_at=now, is_approved=True
+            ).model_dump()
+            for j in range(args.comments)
+        ]
+        book_dict["comment_count"] = args.comments
+        book_dict["publisher"] = publisher.model_dump()
+        page.append(book_dict)
+    return page
+
+def serializers():
+    from typing import List
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from pydantic import TypeAdapter
+
+    from routers.book_router import BookWithAuthors
+
+    adapter = TypeAdapter(List[BookWithAuthors])
+
+    def validated(page):
+        return JSONResponse(adapter.dump_python(adapter.validate_python(page), mode="json")).body
+
+    def stdlib(page):
+        return JSONResponse(jsonable_encoder(page)).body
+
+    def fast(page):
+        return ORJSONResponse(page).body
+
+    result = [("response_model", validated), ("json_response", stdlib)]
+    try:
+        import orjson
+        result.append(("json_response_orjson", fast))
+    except ImportError:
+        print("orjson is not installed, skipping the fast path")
+    return result
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, str(SRC_DIR))
+
+    candidates = serializers()
+    results = {}
+    for page_size in args.page_sizes:
+        page = build_page(args, page_size)
+        results[page_size] = {}
+        for name, serialize in candidates:
+            best = min(repeat(lambda: serialize(page), number=args.number, repeat=args.repeat)) / args.number
+            results[page_size][name] = {
+                "us_per_page": round(best * 1_000_000, 1),
+                "bytes": len(serialize(page))
+            }
+            print(f"page {page_size:>4}  {name:22} {results[page_size][name]['us_per_page']:>10} us/page")
+
+    report = {
+        "environment": { "python": platform.python_version(), "platform": platform.platform() },
+        "page": {
+            "authors": args.authors,
+            "comments": args.comments,
+            "description_length": args.description_length
+        },
+        "results": results
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
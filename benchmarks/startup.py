@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from statistics import median
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+STARTUP_PROBE = """
+import time
+from fastapi.testclient import TestClient
+started_at = time.perf_counter()
+from main import app
+imported_at = time.perf_counter()
+with TestClient(app) as client:
+    client.get("/")
+    ready_at = time.perf_counter()
+print(imported_at - started_at, ready_at - started_at)
+"""
+
+MIGRATE_PROBE = """
+import time
+from migrate import upgrade
+started_at = time.perf_counter()
+upgrade()
+print(time.perf_counter() - started_at)
+"""
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure application startup time in fresh interpreters")
+    parser.add_argument("--database-url", help="Sync SQLAlchemy URL, defaults to a temporary SQLite file")
+    parser.add_argument("--async-database-url", help="Async SQLAlchemy URL matching --database-url")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", default="startup_output.json")
+    return parser.parse_args()
+
+def probe_env(args):
+    if not args.database_url:
+        path = Path(tempfile.gettempdir()) / "rest_example_startup.db"
+        path.unlink(missing_ok=True)
+        args.database_url = f"sqlite:///{path}"
+        args.async_database_url = f"sqlite+aiosqlite:///{path}"
+    if not args.async_database_url:
+        raise SystemExit("--async-database-url is required together with --database-url")
+    return {
+        **os.environ,
+        "DATABASE_URL": args.database_url,
+        "ASYNC_DATABASE_URL": args.async_database_url,
+        "MAIL_TRANSPORT": "memory",
+        "DB_ECHO": "false"
+    }
+
+def run_probe(code, env):
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return [float(value) for value in result.stdout.splitlines()[-1].split()]
+
+def summarize(samples):
+    return {
+        "median_ms": round(median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1)
+    }
+
+def main():
+    args = parse_args()
+    env = probe_env(args)
+
+    run_probe(MIGRATE_PROBE, env)
+    migrate_samples = [run_probe(MIGRATE_PROBE, env)[0] for _ in range(args.runs)]
+    startup_samples = [run_probe(STARTUP_PROBE, env) for _ in range(args.runs)]
+
+    results = {
+        "import_app": summarize([imported for imported, _ in startup_samples]),
+        "first_request": summarize([ready for _, ready in startup_samples]),
+        "migrate_upgrade_noop": summarize(migrate_samples)
+    }
+    for name, result in results.items():
+        print(f"{name:22} median {result['median_ms']:>8} ms  min {result['min_ms']:>8} ms  max {result['max_ms']:>8} ms")
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": args.database_url.split(":", 1)[0]
+        },
+        "runs": args.runs,
+        "results": results
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import json
+import platform
+import random
+import string
+import sys
+from pathlib import Path
+from timeit import repeat
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare token generator implementations")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[6, 100])
+    parser.add_argument("--number", type=int, default=10000, help="Tokens generated per measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="tokens_output.json")
+    return parser.parse_args()
+
+def legacy_token(length=100):
+    return "".join(random.choice(string.ascii_letters + string.digits) for _ in range(length))
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, str(SRC_DIR))
+    from auth import generate_random_token
+
+    results = {}
+    for length in args.lengths:
+        results[length] = {}
+        for name, generate in [("random_choice", legacy_token), ("token_urlsafe", generate_random_token)]:
+            best = min(repeat(lambda: generate(length), number=args.number, repeat=args.repeat)) / args.number
+            results[length][name] = { "us_per_token": round(best * 1_000_000, 3) }
+            print(f"length {length:>4}  {name:14} {results[length][name]['us_per_token']:>10} us/token")
+
+    report = {
+        "environment": { "python": platform.python_version(), "platform": platform.platform() },
+        "results": results
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
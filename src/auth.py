@@ -1,35 +1,56 @@
-from hashlib import sha256
-from http.client import HTTPException
-import random
-import string
+from datetime import datetime, timedelta
+from secrets import token_urlsafe
 from typing import Annotated
-from fastapi import Depends
+from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from db import get_session
+from db import get_async_session
 from orm.token import Token
+from orm.user import User
+from passwords import needs_rehash, password_hasher, run_in_password_pool, verify
+from signed_tokens import is_signed_token, verify_signed_token
+from token_cache import token_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_user_by_token(token: Annotated[str, Depends(oauth2_scheme)], session: Session = Depends(get_session)):
-    existing_token = session.exec(
-        select(Token).where(Token.token == token)
-    ).first()
-    if not existing_token or not existing_token.is_active:
+async def get_user_by_token(token: Annotated[str, Depends(oauth2_scheme)], session: AsyncSession = Depends(get_async_session)):
+    if is_signed_token(token):
+        user = verify_signed_token(token)
+        if not user:
+            raise HTTPException(status_code=401, detail="Could not validate credentials")
+        return user
+    cached_user = token_cache.get(token)
+    if cached_user:
+        return cached_user
+    row = (await session.exec(
+        select(User, Token.expires_at)
+        .join(Token, Token.user_id == User.id)
+        .where(Token.token == token, Token.is_active == True, Token.expires_at > datetime.now())
+    )).first()
+    if not row:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
-    return existing_token.user
+    user, expires_at = row
+    token_cache.set(token, user, expires_at)
+    return user
 
-def get_current_active_user(user: Annotated[Token, Depends(get_user_by_token)],):
+async def get_current_active_user(user: Annotated[User, Depends(get_user_by_token)],):
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Inactive user")
     return user
 
+def token_expiry(ttl: int):
+    return datetime.now() + timedelta(seconds=ttl)
+
 def generate_random_token(length=100):
-    return "".join(random.choice(string.ascii_letters + string.digits) for _ in range(length))
+    return token_urlsafe(length * 3 // 4 + 1)[:length]
+
+async def verify_password(plain_password: str, hashed_password: str):
+    return await run_in_password_pool(verify, plain_password, hashed_password)
 
-def verify_password(plain_password: str, hashed_password: str):
-    return sha256(plain_password.encode("utf-8")).hexdigest() == hashed_password
+async def hash_password(plain_password: str):
+    return await run_in_password_pool(password_hasher.hash, plain_password)
 
-def hash_password(plain_password: str):
-    return sha256(plain_password.encode("utf-8")).hexdigest()
+def password_needs_rehash(hashed_password: str):
+    return needs_rehash(hashed_password)
@@ -0,0 +1,33 @@
+from typing import Generic, List, TypeVar
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+
+from config import MAX_PAGE_SIZE
+from pagination import is_bigint
+
+T = TypeVar("T")
+
+class Batch(BaseModel, Generic[T]):
+    items: List[T]
+    missing: List[int]
+
+async def parse_ids(ids: str = Query(description="Comma-separated ids")):
+    try:
+        values = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid ids")
+    if not all(is_bigint(value) for value in values):
+        raise HTTPException(status_code=400, detail="Invalid ids")
+    values = list(dict.fromkeys(values))
+    if not values:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(values) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PAGE_SIZE} ids per request")
+    return values
+
+def batch_result(ids, items):
+    items_by_id = { item["id"]: item for item in items }
+    return {
+        "items": [items_by_id[id] for id in ids if id in items_by_id],
+        "missing": [id for id in ids if id not in items_by_id]
+    }
@@ -6,8 +6,58 @@ POSTGRES_HOST = getenv("POSTGRES_HOST", "localhost")
 POSTGRES_PORT = int(getenv("POSTGRES_PORT", "5432"))
 POSTGRES_DB = getenv("POSTGRES_DB", "postgres")
 
+DATABASE_URL = getenv(
+    "DATABASE_URL",
+    f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+)
+ASYNC_DATABASE_URL = getenv(
+    "ASYNC_DATABASE_URL",
+    f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+)
+
 MAIL_FROM = getenv("MAIL_FROM", "Book catalog")
 MAIL_EMAIL = getenv("MAIL_EMAIL", "")
 MAIL_HOST = getenv("MAIL_HOST", "")
 MAIL_PASSWORD = getenv("MAIL_PASSWORD", "")
 MAIL_PORT = int(getenv("MAIL_PORT", "25"))
+
+PAGE_SIZE = int(getenv("PAGE_SIZE", "10"))
+MAX_PAGE_SIZE = int(getenv("MAX_PAGE_SIZE", "100"))
+COMMENT_PREVIEW_SIZE = int(getenv("COMMENT_PREVIEW_SIZE", "3"))
+
+TOKEN_CACHE_SIZE = int(getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(getenv("TOKEN_CACHE_TTL", "60"))
+SESSION_TOKEN_TTL = int(getenv("SESSION_TOKEN_TTL", "2592000"))
+RESET_TOKEN_TTL = int(getenv("RESET_TOKEN_TTL", "3600"))
+MAX_SESSIONS_PER_USER = int(getenv("MAX_SESSIONS_PER_USER", "10"))
+TOKEN_PURGE_INTERVAL = float(getenv("TOKEN_PURGE_INTERVAL", "600"))
+TOKEN_PURGE_BATCH_SIZE = int(getenv("TOKEN_PURGE_BATCH_SIZE", "1000"))
+PASSWORD_HASHER = getenv("PASSWORD_HASHER", "pbkdf2_sha256")
+PASSWORD_HASH_COST = int(getenv("PASSWORD_HASH_COST", "0"))
+PASSWORD_HASH_WORKERS = int(getenv("PASSWORD_HASH_WORKERS", "2"))
+SIGNED_TOKENS = getenv("SIGNED_TOKENS", "false").lower() == "true"
+AUTH_SECRET_KEY = getenv("AUTH_SECRET_KEY", "")
+SIGNED_TOKEN_TTL = int(getenv("SIGNED_TOKEN_TTL", "900"))
+if SIGNED_TOKENS and not AUTH_SECRET_KEY:
+    raise RuntimeError("SIGNED_TOKENS=true requires AUTH_SECRET_KEY to be set")
+
+DB_ECHO = getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RECYCLE = int(getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT = int(getenv("DB_STATEMENT_TIMEOUT", "0"))
+
+MAIL_TRANSPORT = getenv("MAIL_TRANSPORT", "smtp")
+MAIL_FILE = getenv("MAIL_FILE", "mail.log")
+MAIL_BATCH_SIZE = int(getenv("MAIL_BATCH_SIZE", "20"))
+MAIL_POLL_INTERVAL = float(getenv("MAIL_POLL_INTERVAL", "5"))
+MAIL_MAX_ATTEMPTS = int(getenv("MAIL_MAX_ATTEMPTS", "5"))
+MAIL_RETRY_DELAY = float(getenv("MAIL_RETRY_DELAY", "30"))
+MAIL_TIMEOUT = float(getenv("MAIL_TIMEOUT", "30"))
+
+BULK_MAX_ROWS = int(getenv("BULK_MAX_ROWS", "1000"))
+BULK_MAX_BYTES = int(getenv("BULK_MAX_BYTES", "10485760"))
+EXPORT_BATCH_SIZE = int(getenv("EXPORT_BATCH_SIZE", "500"))
+
+FAST_JSON = getenv("FAST_JSON", "false").lower() == "true"
@@ -1,4 +1,7 @@
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from orm.author import *
 from orm.book import *
@@ -6,19 +9,55 @@ from orm.book_author import *
 from orm.book_genre import *
 from orm.comment import *
 from orm.genre import *
+from orm.outbox import *
 from orm.publisher import *
 from orm.report import *
+from orm.table_version import *
 from orm.token import *
 from orm.user import *
 from config import *
+from metrics import after_cursor_execute, before_cursor_execute
 
-DATABASE_URL = f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+ENGINE_OPTIONS = {
+    "echo": DB_ECHO,
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+    "pool_recycle": DB_POOL_RECYCLE
+}
 
-engine = create_engine(DATABASE_URL, echo=True)
+def postgres_connect_args(url, connect_args):
+    return connect_args if url.startswith("postgresql") else {}
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args=postgres_connect_args(DATABASE_URL, { "options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT}" }),
+    **ENGINE_OPTIONS
+)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=postgres_connect_args(ASYNC_DATABASE_URL, { "server_settings": { "statement_timeout": str(DB_STATEMENT_TIMEOUT) } }),
+    **ENGINE_OPTIONS
+)
+
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+for sync_engine in [engine, async_engine.sync_engine]:
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", enable_sqlite_foreign_keys)
 
 def get_session():
     with Session(engine) as session:
         yield session
 
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
@@ -0,0 +1,45 @@
+from typing import Optional
+from fastapi import HTTPException, Query
+from sqlalchemy import select
+
+class FieldParams:
+    def __init__(self, fields: Optional[str] = None, include: Optional[str] = None):
+        self.fields = fields
+        self.include = include
+
+    @property
+    def sparse(self):
+        return self.fields is not None or self.include is not None
+
+async def get_field_params(
+    fields: Optional[str] = Query(default=None, description="Comma-separated columns to return"),
+    include: Optional[str] = Query(default=None, description="Comma-separated relations to load")
+):
+    return FieldParams(fields, include)
+
+def parse_list(value: Optional[str], allowed, name: str):
+    items = list(dict.fromkeys(item.strip() for item in value.split(",") if item.strip()))
+    unknown = [item for item in items if item not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown {name}: {', '.join(unknown)}")
+    return items
+
+def column_names(model, hidden=()):
+    return [name for name in model.__table__.columns.keys() if name not in hidden]
+
+def requested_fields(params: FieldParams, model, hidden=()):
+    allowed = column_names(model, hidden)
+    if params.fields is None:
+        return allowed
+    fields = parse_list(params.fields, allowed, "fields")
+    return fields if "id" in fields else ["id", *fields]
+
+def requested_relations(params: FieldParams, relations, default=()):
+    if params.include is None:
+        return list(default)
+    return parse_list(params.include, relations, "relations")
+
+def select_fields(model, fields, extra=()):
+    # Core select keeps Row results even for a single column, which sqlmodel's select would turn into scalars
+    names = list(dict.fromkeys([*fields, *extra]))
+    return select(*[getattr(model, name) for name in names])
@@ -0,0 +1,119 @@
+from typing import Sequence
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from fieldsets import column_names
+from orm.author import Author
+from orm.book import Book
+from orm.book_author import BookAuthor
+from orm.book_genre import BookGenre
+from orm.comment import Comment
+from orm.genre import Genre
+from orm.publisher import Publisher
+
+async def load_publishers(session: AsyncSession, books: Sequence[Book]):
+    publisher_ids = {book.publisher_id for book in books if book.publisher_id}
+    if not publisher_ids:
+        return {}
+    publishers = (await session.exec(
+        select(Publisher).where(Publisher.id.in_(publisher_ids))
+    )).all()
+    return {publisher.id: publisher for publisher in publishers}
+
+async def load_authors(session: AsyncSession, books: Sequence[Book]):
+    authors_by_book = {book.id: [] for book in books}
+    if not authors_by_book:
+        return authors_by_book
+    rows = (await session.exec(
+        select(BookAuthor.book_id, Author)
+        .join(Author, Author.id == BookAuthor.author_id)
+        .where(BookAuthor.book_id.in_(authors_by_book.keys()))
+    )).all()
+    for book_id, author in rows:
+        authors_by_book[book_id].append(author)
+    return authors_by_book
+
+async def load_genres(session: AsyncSession, books: Sequence[Book]):
+    genres_by_book = {book.id: [] for book in books}
+    if not genres_by_book:
+        return genres_by_book
+    rows = (await session.exec(
+        select(BookGenre.book_id, Genre)
+        .join(Genre, Genre.id == BookGenre.genre_id)
+        .where(BookGenre.book_id.in_(genres_by_book.keys()))
+    )).all()
+    for book_id, genre in rows:
+        genres_by_book[book_id].append(genre)
+    return genres_by_book
+
+async def load_latest_comments(session: AsyncSession, books: Sequence[Book], limit: int, include_unapproved=False):
+    comments_by_book = {book.id: [] for book in books}
+    counts_by_book = {book.id: 0 for book in books}
+    if not comments_by_book:
+        return comments_by_book, counts_by_book
+
+    ranked = select(
+        Comment,
+        func.row_number().over(partition_by=Comment.book_id, order_by=Comment.id.desc()).label("position"),
+        func.count().over(partition_by=Comment.book_id).label("total")
+    ).where(Comment.book_id.in_(comments_by_book.keys()))
+    if not include_unapproved:
+        ranked = ranked.where(Comment.is_approved == True)
+    ranked = ranked.subquery()
+    ranked_comment = aliased(Comment, ranked)
+
+    rows = (await session.exec(
+        select(ranked_comment, ranked.c.total)
+        .where(ranked.c.position <= max(limit, 1))
+        .order_by(ranked.c.book_id, ranked.c.position)
+    )).all()
+    for comment, total in rows:
+        counts_by_book[comment.book_id] = total
+        if len(comments_by_book[comment.book_id]) < limit:
+            comments_by_book[comment.book_id].append(comment)
+    return comments_by_book, counts_by_book
+
+async def load_book_fields(session: AsyncSession, books, fields, relations, include_unapproved=False, comment_limit=0):
+    publishers = await load_publishers(session, books) if "publisher" in relations else {}
+    authors = await load_authors(session, books) if "authors" in relations else {}
+    genres = await load_genres(session, books) if "genres" in relations else {}
+    comments, comment_counts = (
+        await load_latest_comments(session, books, comment_limit, include_unapproved)
+        if "comments" in relations else ({}, {})
+    )
+
+    result = []
+    for book in books:
+        book_dict = { name: getattr(book, name) for name in fields }
+        if "authors" in relations:
+            book_dict["authors"] = [author.model_dump() for author in authors[book.id]]
+        if "genres" in relations:
+            book_dict["genres"] = [genre.model_dump() for genre in genres[book.id]]
+        if "comments" in relations:
+            book_dict["comments"] = [comment.model_dump() for comment in comments[book.id]]
+            book_dict["comment_count"] = comment_counts[book.id]
+        if "publisher" in relations:
+            publisher = publishers.get(book.publisher_id)
+            book_dict["publisher"] = publisher.model_dump() if publisher else None
+        result.append(book_dict)
+    return result
+
+async def load_books_with_authors(session: AsyncSession, books: Sequence[Book], include_unapproved=False, comment_limit=0):
+    return await load_book_fields(
+        session, books, column_names(Book, hidden={"rating_sum"}), ["authors", "comments", "publisher"],
+        include_unapproved, comment_limit
+    )
+
+async def load_book_refs(session: AsyncSession, keys, key_column):
+    books_by_key = { key: [] for key in keys }
+    if not books_by_key:
+        return books_by_key
+    query = select(key_column, Book.id, Book.title)
+    if key_column.class_ is not Book:
+        query = query.join(Book, Book.id == key_column.class_.book_id)
+    rows = (await session.exec(query.where(key_column.in_(books_by_key.keys())).order_by(Book.id))).all()
+    for key, book_id, title in rows:
+        books_by_key[key].append({ "id": book_id, "title": title })
+    return books_by_key
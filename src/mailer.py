@@ -1,17 +1,165 @@
+from datetime import datetime, timedelta
 from email.utils import formataddr
-from smtplib import SMTP
+import logging
+from smtplib import SMTP, SMTPException, SMTPServerDisconnected
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from threading import Event, Lock, Thread
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session, delete, select
 
 from config import *
+from db import engine
+from orm.outbox import OutboxEmail
 
-def send_email(to_email, subject, body):
+logger = logging.getLogger(__name__)
+
+mail_wakeup = Event()
+
+def build_message(to_email, subject, body):
     message = MIMEMultipart()
     message["From"] = formataddr((MAIL_FROM, MAIL_EMAIL))
     message["To"] = to_email
     message["Subject"] = subject
     message.attach(MIMEText(body, "plain"))
-    server = SMTP(MAIL_HOST, MAIL_PORT)
-    server.starttls()
-    server.login(MAIL_EMAIL, MAIL_PASSWORD)
-    server.sendmail(MAIL_EMAIL, to_email, message.as_string())
+    return message
+
+class SMTPTransport:
+    def __init__(self):
+        self.server = None
+
+    def connect(self):
+        server = SMTP(MAIL_HOST, MAIL_PORT, timeout=MAIL_TIMEOUT)
+        server.starttls()
+        server.login(MAIL_EMAIL, MAIL_PASSWORD)
+        self.server = server
+
+    def send(self, to_email, message):
+        if self.server is None:
+            self.connect()
+        try:
+            self.server.sendmail(MAIL_EMAIL, to_email, message.as_string())
+        except SMTPServerDisconnected:
+            self.server = None
+            self.connect()
+            self.server.sendmail(MAIL_EMAIL, to_email, message.as_string())
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (SMTPException, OSError):
+                pass
+            self.server = None
+
+class FileTransport:
+    def __init__(self, path=MAIL_FILE):
+        self.path = path
+
+    def send(self, to_email, message):
+        with open(self.path, "a", encoding="utf-8") as mail_file:
+            mail_file.write(message.as_string())
+            mail_file.write("\n")
+
+    def close(self):
+        pass
+
+class MemoryTransport:
+    def __init__(self):
+        self.messages = []
+        self.lock = Lock()
+
+    def send(self, to_email, message):
+        with self.lock:
+            self.messages.append((to_email, message))
+
+    def close(self):
+        pass
+
+def get_transport():
+    if MAIL_TRANSPORT == "file":
+        return FileTransport()
+    if MAIL_TRANSPORT == "memory":
+        return MemoryTransport()
+    return SMTPTransport()
+
+def queue_email(session, to_email, subject, body):
+    session.add(OutboxEmail(to_email=to_email, subject=subject, body=body))
+
+def notify_mail_worker():
+    mail_wakeup.set()
+
+def deliver_pending(session: Session, transport, batch_size=MAIL_BATCH_SIZE):
+    emails = session.exec(
+        select(OutboxEmail)
+        .where(
+            OutboxEmail.attempts < MAIL_MAX_ATTEMPTS,
+            OutboxEmail.next_attempt_at <= datetime.now()
+        )
+        .order_by(OutboxEmail.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+    for email in emails:
+        try:
+            transport.send(email.to_email, build_message(email.to_email, email.subject, email.body))
+        except Exception as error:
+            email.attempts += 1
+            if email.attempts >= MAIL_MAX_ATTEMPTS:
+                # The body may hold a reset key or a new password, so undeliverable rows are not kept
+                logger.error("Giving up on email %s after %s attempts: %s", email.id, email.attempts, error)
+                session.delete(email)
+                continue
+            email.last_error = str(error)[:1000]
+            email.next_attempt_at = datetime.now() + timedelta(seconds=MAIL_RETRY_DELAY * 2 ** (email.attempts - 1))
+            session.add(email)
+            logger.warning("Failed to send email %s (attempt %s): %s", email.id, email.attempts, error)
+        else:
+            session.delete(email)
+    session.commit()
+    return len(emails)
+
+def purge_dead_emails(session: Session):
+    purged = session.exec(delete(OutboxEmail).where(OutboxEmail.attempts >= MAIL_MAX_ATTEMPTS)).rowcount
+    session.commit()
+    return purged
+
+class MailWorker(Thread):
+    def __init__(self, transport=None):
+        super().__init__(name="mail-worker", daemon=True)
+        self.transport = transport or get_transport()
+        self.stopping = Event()
+
+    def run(self):
+        try:
+            try:
+                with Session(engine) as session:
+                    purged = purge_dead_emails(session)
+                if purged:
+                    logger.warning("Deleted %s undeliverable emails", purged)
+            except SQLAlchemyError:
+                logger.exception("Failed to purge the email outbox")
+            while not self.stopping.is_set():
+                try:
+                    with Session(engine) as session:
+                        processed = deliver_pending(session, self.transport)
+                except SQLAlchemyError:
+                    logger.exception("Failed to read the email outbox")
+                    processed = 0
+                except Exception:
+                    logger.exception("Mail worker iteration failed")
+                    processed = 0
+                if processed < MAIL_BATCH_SIZE:
+                    mail_wakeup.wait(MAIL_POLL_INTERVAL)
+                    mail_wakeup.clear()
+        finally:
+            self.transport.close()
+
+    def stop(self):
+        self.stopping.set()
+        mail_wakeup.set()
+        self.join()
@@ -1,9 +1,13 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from db import create_db_and_tables
+from mailer import MailWorker
+from metrics import metrics, metrics_middleware
+from token_purge import TokenPurgeWorker
 from routers.login_router import login_router
 from routers.register_router import register_router
 from routers.user_router import user_router
@@ -11,9 +15,22 @@ from routers.author_router import author_router
 from routers.genre_router import genre_router
 from routers.publisher_router import publisher_router
 from routers.book_router import book_router
+from routers.catalog_router import catalog_router
 from routers.report_router import report_router
+from routers.search_router import search_router
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    mail_worker = MailWorker()
+    mail_worker.start()
+    token_purge_worker = TokenPurgeWorker()
+    token_purge_worker.start()
+    yield
+    token_purge_worker.stop()
+    mail_worker.stop()
+
+app = FastAPI(lifespan=lifespan)
+app.middleware("http")(metrics_middleware)
 app.include_router(login_router)
 app.include_router(register_router)
 app.include_router(user_router)
@@ -21,10 +38,15 @@ app.include_router(author_router)
 app.include_router(genre_router)
 app.include_router(publisher_router)
 app.include_router(book_router)
+app.include_router(catalog_router)
 app.include_router(report_router)
+app.include_router(search_router)
 
 @app.get("/")
 async def root():
     return { "message": "Hello World" }
 
-create_db_and_tables()
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
@@ -0,0 +1,109 @@
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from typing import Optional
+from fastapi import Request
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start_time"] = perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info.pop("query_start_time", None)
+    stats = request_stats.get()
+    if stats is not None and started_at is not None:
+        stats.queries += 1
+        stats.db_time += perf_counter() - started_at
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    def __init__(self):
+        self.lock = Lock()
+        self.requests = defaultdict(int)
+        self.queries = defaultdict(int)
+        self.request_duration = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.db_duration = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.query_count = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+
+    def record(self, method, route, status, duration, stats: RequestStats):
+        with self.lock:
+            self.requests[(method, route, status)] += 1
+            self.queries[(method, route)] += stats.queries
+            self.request_duration[(method, route)].observe(duration)
+            self.db_duration[(method, route)].observe(stats.db_time)
+            self.query_count[(method, route)].observe(stats.queries)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), value in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {value}')
+            lines.append("# TYPE db_queries_total counter")
+            for (method, route), value in sorted(self.queries.items()):
+                lines.append(f'db_queries_total{{method="{method}",route="{route}"}} {value}')
+            for name, histograms in [
+                ("http_request_duration_seconds", self.request_duration),
+                ("db_query_duration_seconds", self.db_duration),
+                ("db_queries_per_request", self.query_count)
+            ]:
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), histogram in sorted(histograms.items()):
+                    labels = f'method="{method}",route="{route}"'
+                    cumulative = 0
+                    for bucket, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+def route_label(request: Request):
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+async def metrics_middleware(request: Request, call_next):
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    started_at = perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        metrics.record(request.method, route_label(request), 500, perf_counter() - started_at, stats)
+        raise
+    finally:
+        request_stats.reset(token)
+    duration = perf_counter() - started_at
+
+    response.headers["Server-Timing"] = (
+        f'db;desc="{stats.queries} queries";dur={stats.db_time * 1000:.1f}, '
+        f"app;dur={(duration - stats.db_time) * 1000:.1f}, "
+        f"total;dur={duration * 1000:.1f}"
+    )
+    metrics.record(request.method, route_label(request), response.status_code, duration, stats)
+    return response
@@ -0,0 +1,82 @@
+import argparse
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import inspect, literal
+from sqlalchemy.schema import CreateColumn
+from sqlmodel import SQLModel
+
+from db import create_db_and_tables, engine
+from orm.author import AUTHOR_SEARCH_DDL
+from orm.book import BOOK_SEARCH_DDL, TRIGRAM_EXTENSION_DDL
+from ratings import RATING_COLUMNS, recompute_book_ratings
+
+POSTGRES_DDL = [TRIGRAM_EXTENSION_DDL, BOOK_SEARCH_DDL, AUTHOR_SEARCH_DDL]
+
+def add_column_ddl(column, dialect):
+    ddl = str(CreateColumn(column).compile(dialect=dialect))
+    if column.server_default is None and column.default is not None and column.default.is_scalar:
+        default = literal(column.default.arg).compile(dialect=dialect, compile_kwargs={ "literal_binds": True })
+        ddl += f" DEFAULT {default}"
+    elif not column.nullable and column.server_default is None:
+        raise SystemExit(f"Cannot add NOT NULL column {column.table.name}.{column.name} without a default")
+    return f"ALTER TABLE {dialect.identifier_preparer.format_table(column.table)} ADD {ddl}"
+
+def pending_changes(connection):
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    changes = []
+    backfill_ratings = False
+    for table in SQLModel.metadata.sorted_tables:
+        if table.name not in tables:
+            changes.append((f"create table {table.name}", None))
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                changes.append((f"add column {table.name}.{column.name}", add_column_ddl(column, connection.dialect)))
+                if table.name == "book" and column.name in RATING_COLUMNS:
+                    backfill_ratings = True
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                changes.append((f"create index {index.name}", index))
+    if backfill_ratings:
+        changes.append(("recompute book rating aggregates", recompute_book_ratings))
+    return changes
+
+def upgrade():
+    create_db_and_tables()
+    with engine.begin() as connection:
+        changes = pending_changes(connection)
+        for description, change in changes:
+            print(description)
+            if isinstance(change, str):
+                connection.exec_driver_sql(change)
+            elif callable(change):
+                change(connection)
+            else:
+                change.create(connection)
+        if connection.dialect.name == "postgresql":
+            for ddl in POSTGRES_DDL:
+                connection.execute(ddl)
+
+def check():
+    with engine.connect() as connection:
+        changes = pending_changes(connection)
+    for description, _ in changes:
+        print(description)
+    return not changes
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or upgrade the database schema")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "check"], default="upgrade")
+    args = parser.parse_args()
+    if args.command == "check":
+        sys.exit(0 if check() else 1)
+    upgrade()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import List, Optional
+from sqlalchemy import DDL, event
 from sqlmodel import Relationship, SQLModel, Field
 
 from orm.book_author import BookAuthor
@@ -13,3 +14,12 @@ class Author(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.now)
 
     books: List["Book"] = Relationship(back_populates="authors", link_model=BookAuthor)
+
+AUTHOR_SEARCH_DDL = DDL(
+    "ALTER TABLE author ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, ''))) STORED; "
+    "CREATE INDEX IF NOT EXISTS ix_author_search_vector ON author USING GIN (search_vector); "
+    "CREATE INDEX IF NOT EXISTS ix_author_last_name_trgm ON author USING GIN (last_name gin_trgm_ops)"
+).execute_if(dialect="postgresql")
+
+event.listen(Author.__table__, "after_create", AUTHOR_SEARCH_DDL)
@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import List, Optional
+from sqlalchemy import DDL, Index, event
 from sqlmodel import ForeignKey, Relationship, SQLModel, Field
 
 from orm.book_author import BookAuthor
@@ -8,13 +9,35 @@ from orm.book_genre import BookGenre
 class Book(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str = Field(index=True, max_length=100)
-    publication_year: Optional[int] = None
+    publication_year: Optional[int] = Field(default=None, index=True)
     page_count: Optional[int] = None
     description: Optional[str] = Field(default=None, max_length=2000)
     image_url: Optional[str] = Field(default=None, max_length=200)
-    publisher_id: Optional[int] = Field(default=None, sa_type=ForeignKey("publisher.id", ondelete="SET NULL"))
+    publisher_id: Optional[int] = Field(default=None, sa_type=ForeignKey("publisher.id", ondelete="SET NULL"), index=True)
     created_at: datetime = Field(default_factory=datetime.now)
+    average_rating: float = Field(default=0.0)
+    rating_count: int = Field(default=0)
+    rating_sum: int = Field(default=0)
+    approved_comment_count: int = Field(default=0)
 
     genres: List["Genre"] = Relationship(back_populates="books", link_model=BookGenre)
     authors: List["Author"] = Relationship(back_populates="books", link_model=BookAuthor)
     publisher: Optional["Publisher"] = Relationship(back_populates="books")
+
+    __table_args__ = (
+        Index("ix_book_average_rating_id", "average_rating", "id"),
+        Index("ix_book_approved_comment_count_id", "approved_comment_count", "id"),
+    )
+
+TRIGRAM_EXTENSION_DDL = DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+
+BOOK_SEARCH_DDL = DDL(
+    "ALTER TABLE book ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')) STORED; "
+    "CREATE INDEX IF NOT EXISTS ix_book_search_vector ON book USING GIN (search_vector); "
+    "CREATE INDEX IF NOT EXISTS ix_book_title_trgm ON book USING GIN (title gin_trgm_ops)"
+).execute_if(dialect="postgresql")
+
+event.listen(SQLModel.metadata, "before_create", TRIGRAM_EXTENSION_DDL)
+event.listen(Book.__table__, "after_create", BOOK_SEARCH_DDL)
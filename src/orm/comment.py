@@ -1,12 +1,20 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index, text
 from sqlmodel import ForeignKey, SQLModel, Field
 
+PENDING = { "postgresql_where": text("is_approved = false"), "sqlite_where": text("is_approved = 0") }
+
 class Comment(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    book_id: int = Field(sa_type=ForeignKey("book.id", ondelete="CASCADE"))
+    book_id: int = Field(sa_type=ForeignKey("book.id", ondelete="CASCADE"), index=True)
     user_id: int = Field(sa_type=ForeignKey("user.id", ondelete="CASCADE"))
     comment_text: str = Field(max_length=2000)
     rating: Optional[int] = Field(default=None)
     created_at: datetime = Field(default_factory=datetime.now)
     is_approved: bool = Field(default=False)
+
+    __table_args__ = (
+        Index("ix_comment_pending_id", "id", **PENDING),
+        Index("ix_comment_pending_book_id", "book_id", "id", **PENDING),
+    )
@@ -0,0 +1,13 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import SQLModel, Field
+
+class OutboxEmail(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    to_email: str = Field(max_length=150)
+    subject: str = Field(max_length=200)
+    body: str = Field(max_length=2000)
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = Field(default=None, max_length=1000)
+    created_at: datetime = Field(default_factory=datetime.now)
+    next_attempt_at: datetime = Field(default_factory=datetime.now, index=True)
@@ -1,7 +1,10 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index, text
 from sqlmodel import ForeignKey, SQLModel, Field
 
+UNRESOLVED = { "postgresql_where": text("resolved_at IS NULL"), "sqlite_where": text("resolved_at IS NULL") }
+
 class Report(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     comment_id: int = Field(sa_type=ForeignKey("comment.id", ondelete="CASCADE"))
@@ -9,3 +12,8 @@ class Report(SQLModel, table=True):
     reason_text: str = Field(max_length=1000)
     created_at: datetime = Field(default_factory=datetime.now)
     resolved_at: Optional[datetime] = None
+
+    __table_args__ = (
+        Index("ix_report_unresolved_id", "id", **UNRESOLVED),
+        Index("ix_report_unresolved_comment_id", "comment_id", "id", **UNRESOLVED),
+    )
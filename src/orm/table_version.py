@@ -0,0 +1,7 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+class TableVersion(SQLModel, table=True):
+    name: str = Field(primary_key=True, max_length=50)
+    version: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.now)
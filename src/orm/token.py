@@ -10,5 +10,6 @@ class Token(SQLModel, table=True):
     token: str = Field(max_length=100, unique=True)
     created_at: datetime = Field(default_factory=datetime.now)
     is_active: bool = Field(default=False)
+    expires_at: Optional[datetime] = Field(default=None, index=True)
 
     user: User = Relationship()
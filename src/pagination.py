@@ -0,0 +1,68 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+import json
+from math import isfinite
+from typing import Optional
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import tuple_
+
+from config import MAX_PAGE_SIZE, PAGE_SIZE
+
+INTEGER_MIN, INTEGER_MAX = -2 ** 31, 2 ** 31 - 1
+BIGINT_MIN, BIGINT_MAX = -2 ** 63, 2 ** 63 - 1
+
+class PageParams:
+    def __init__(self, offset: int = 0, cursor: Optional[str] = None, limit: int = PAGE_SIZE):
+        self.offset = offset
+        self.cursor = cursor
+        self.limit = limit
+
+async def get_page_params(
+    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    return PageParams(offset, cursor, limit)
+
+def encode_cursor(key):
+    return urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+def is_bigint(value):
+    return isinstance(value, int) and not isinstance(value, bool) and BIGINT_MIN <= value <= BIGINT_MAX
+
+def is_sort_value(value):
+    if isinstance(value, float):
+        return isfinite(value)
+    return is_bigint(value)
+
+def decode_cursor(cursor: str, sorted_by=False):
+    try:
+        key = json.loads(urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except (BinasciiError, UnicodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if sorted_by:
+        valid = isinstance(key, list) and len(key) == 2 and is_sort_value(key[0]) and is_bigint(key[1])
+    else:
+        valid = is_bigint(key)
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+def paginate(query, id_column, page: PageParams, sort_column=None):
+    if sort_column is not None:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+        if page.cursor:
+            value, last_id = decode_cursor(page.cursor, sorted_by=True)
+            return query.where(tuple_(sort_column, id_column) < tuple_(value, last_id)).limit(page.limit)
+        return query.offset(page.offset).limit(page.limit)
+
+    query = query.order_by(id_column)
+    if page.cursor:
+        return query.where(id_column > decode_cursor(page.cursor)).limit(page.limit)
+    return query.offset(page.offset).limit(page.limit)
+
+def set_next_cursor(response: Response, items, page: PageParams, sort_field=None):
+    if len(items) == page.limit:
+        last = items[-1]
+        key = [getattr(last, sort_field), last.id] if sort_field else last.id
+        response.headers["X-Next-Cursor"] = encode_cursor(key)
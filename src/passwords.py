@@ -0,0 +1,81 @@
+import asyncio
+from base64 import b64decode, b64encode
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import pbkdf2_hmac, scrypt, sha256
+import hmac
+import os
+
+from config import PASSWORD_HASH_COST, PASSWORD_HASH_WORKERS, PASSWORD_HASHER
+
+class PBKDF2Hasher:
+    algorithm = "pbkdf2_sha256"
+    default_cost = 600000
+
+    def __init__(self, cost=None):
+        self.iterations = cost or self.default_cost
+
+    def hash(self, password: str):
+        salt = os.urandom(16)
+        digest = pbkdf2_hmac("sha256", password.encode("utf-8"), salt, self.iterations)
+        return f"{self.algorithm}${self.iterations}${b64encode(salt).decode()}${b64encode(digest).decode()}"
+
+    def verify(self, password: str, encoded: str):
+        _, iterations, salt, digest = encoded.split("$")
+        candidate = pbkdf2_hmac("sha256", password.encode("utf-8"), b64decode(salt), int(iterations))
+        return hmac.compare_digest(candidate, b64decode(digest))
+
+    def needs_rehash(self, encoded: str):
+        return int(encoded.split("$")[1]) != self.iterations
+
+class ScryptHasher:
+    algorithm = "scrypt"
+    default_cost = 14
+
+    def __init__(self, cost=None):
+        self.log_n = cost or self.default_cost
+
+    def derive(self, password: str, salt: bytes, log_n: int):
+        return scrypt(password.encode("utf-8"), salt=salt, n=2 ** log_n, r=8, p=1, maxmem=2 ** (log_n + 11), dklen=32)
+
+    def hash(self, password: str):
+        salt = os.urandom(16)
+        digest = self.derive(password, salt, self.log_n)
+        return f"{self.algorithm}${self.log_n}${b64encode(salt).decode()}${b64encode(digest).decode()}"
+
+    def verify(self, password: str, encoded: str):
+        _, log_n, salt, digest = encoded.split("$")
+        return hmac.compare_digest(self.derive(password, b64decode(salt), int(log_n)), b64decode(digest))
+
+    def needs_rehash(self, encoded: str):
+        return int(encoded.split("$")[1]) != self.log_n
+
+class LegacySHA256Hasher:
+    algorithm = "sha256"
+
+    def verify(self, password: str, encoded: str):
+        return hmac.compare_digest(sha256(password.encode("utf-8")).hexdigest(), encoded)
+
+HASHERS = { hasher.algorithm: hasher for hasher in [PBKDF2Hasher, ScryptHasher] }
+
+password_hasher = HASHERS[PASSWORD_HASHER](PASSWORD_HASH_COST)
+legacy_hasher = LegacySHA256Hasher()
+
+def hasher_for(encoded: str):
+    algorithm = encoded.split("$", 1)[0] if "$" in encoded else legacy_hasher.algorithm
+    if algorithm == password_hasher.algorithm:
+        return password_hasher
+    if algorithm == legacy_hasher.algorithm:
+        return legacy_hasher
+    return HASHERS[algorithm]()
+
+def verify(password: str, encoded: str):
+    return hasher_for(encoded).verify(password, encoded)
+
+def needs_rehash(encoded: str):
+    hasher = hasher_for(encoded)
+    return hasher is not password_hasher or password_hasher.needs_rehash(encoded)
+
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hasher")
+
+async def run_in_password_pool(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(password_executor, function, *args)
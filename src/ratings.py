@@ -0,0 +1,72 @@
+from sqlalchemy import Float, bindparam, case, cast, func, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from orm.book import Book
+from orm.comment import Comment
+
+async def update_book_rating(session: AsyncSession, comment: Comment, sign: int):
+    values = { "approved_comment_count": Book.approved_comment_count + sign }
+    if comment.rating is not None:
+        rating_count = Book.rating_count + sign
+        rating_sum = Book.rating_sum + sign * comment.rating
+        values["rating_count"] = rating_count
+        values["rating_sum"] = rating_sum
+        values["average_rating"] = case((rating_count > 0, cast(rating_sum, Float) / rating_count), else_=0.0)
+    await session.exec(
+        update(Book)
+        .where(Book.id == comment.book_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+async def update_book_ratings(session: AsyncSession, comments, sign: int):
+    deltas = {}
+    for comment in comments:
+        delta = deltas.setdefault(comment.book_id, { "b_id": comment.book_id, "count": 0, "rated": 0, "total": 0 })
+        delta["count"] += sign
+        if comment.rating is not None:
+            delta["rated"] += sign
+            delta["total"] += sign * comment.rating
+    if not deltas:
+        return
+
+    book = Book.__table__.c
+    rating_count = book.rating_count + bindparam("rated")
+    rating_sum = book.rating_sum + bindparam("total")
+    await session.exec(
+        update(Book.__table__)
+        .where(book.id == bindparam("b_id"))
+        .values(
+            approved_comment_count=book.approved_comment_count + bindparam("count"),
+            rating_count=rating_count,
+            rating_sum=rating_sum,
+            average_rating=case((rating_count > 0, cast(rating_sum, Float) / rating_count), else_=0.0)
+        ),
+        params=list(deltas.values())
+    )
+
+RATING_COLUMNS = {"average_rating", "rating_count", "rating_sum", "approved_comment_count"}
+
+def recompute_book_ratings(connection):
+    totals = (
+        select(
+            Comment.book_id,
+            func.count().label("comments"),
+            func.count(Comment.rating).label("rated"),
+            func.coalesce(func.sum(Comment.rating), 0).label("total")
+        )
+        .where(Comment.is_approved == True)
+        .group_by(Comment.book_id)
+        .subquery()
+    )
+    book = Book.__table__.c
+    connection.execute(
+        update(Book.__table__)
+        .where(book.id == totals.c.book_id)
+        .values(
+            approved_comment_count=totals.c.comments,
+            rating_count=totals.c.rated,
+            rating_sum=totals.c.total,
+            average_rating=case((totals.c.rated > 0, cast(totals.c.total, Float) / totals.c.rated), else_=0.0)
+        )
+    )
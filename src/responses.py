@@ -0,0 +1,16 @@
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from config import FAST_JSON
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_response(content, response: Response):
+    headers = dict(response.headers)
+    if FAST_JSON and orjson is not None:
+        return ORJSONResponse(content, headers=headers)
+    return JSONResponse(jsonable_encoder(content), headers=headers)
@@ -1,13 +1,21 @@
 from datetime import datetime
 from typing import Annotated, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from auth import get_current_active_user
-from db import get_session
+from batch import Batch, batch_result, parse_ids
+from db import get_async_session
+from fieldsets import FieldParams, get_field_params, requested_fields, requested_relations, select_fields
+from loaders import load_book_refs
 from orm.author import Author
+from orm.book import Book
+from orm.book_author import BookAuthor
 from orm.user import User, Role
+from pagination import PageParams, get_page_params, paginate, set_next_cursor
+from responses import json_response
+from versions import bump_versions, conditional_response
 
 author_router = APIRouter()
 
@@ -24,30 +32,31 @@ class AuthorUpdate(BaseModel):
     birth_date: Optional[datetime] = None
 
 @author_router.post("/authors", response_model=Author)
-def create_author(
+async def create_author(
     author: AuthorCreate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.EDITOR, Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     db_author = Author(**author.model_dump())
     session.add(db_author)
-    session.commit()
-    session.refresh(db_author)
+    await bump_versions(session, Author)
+    await session.commit()
+    await session.refresh(db_author)
     return db_author
 
 @author_router.put("/authors/{author_id}", response_model=Author)
-def update_author(
+async def update_author(
     author_id: int,
     author: AuthorUpdate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.EDITOR, Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    db_author = session.get(Author, author_id)
+    db_author = await session.get(Author, author_id)
     if not db_author:
         raise HTTPException(status_code=404, detail="Author not found")
 
@@ -56,36 +65,74 @@ def update_author(
         setattr(db_author, key, value)
 
     session.add(db_author)
-    session.commit()
-    session.refresh(db_author)
+    await bump_versions(session, Author)
+    await session.commit()
+    await session.refresh(db_author)
     return db_author
 
 @author_router.delete("/authors/{author_id}")
-def delete_author(
+async def delete_author(
     author_id: int,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    db_author = session.get(Author, author_id)
+    db_author = await session.get(Author, author_id)
     if not db_author:
         raise HTTPException(status_code=404, detail="Author not found")
 
-    session.delete(db_author)
-    session.commit()
+    await session.delete(db_author)
+    await bump_versions(session, Author)
+    await session.commit()
     return { "ok": True }
 
 @author_router.get("/authors/", response_model=List[Author])
-def get_authors(
+async def get_authors(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    offset: int = Query(default=0, ge=0),
-    session: Session = Depends(get_session)
+    page: Annotated[PageParams, Depends(get_page_params)],
+    field_params: Annotated[FieldParams, Depends(get_field_params)],
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
 ):
-    authors = session.exec(
-        select(Author)
-        .offset(offset)
-        .limit(10)
-    ).all()
-    return authors
+    fields = requested_fields(field_params, Author)
+    relations = requested_relations(field_params, ["books"])
+    models = [Author, Book, BookAuthor] if "books" in relations else [Author]
+    not_modified = await conditional_response(request, response, session, models)
+    if not_modified:
+        return not_modified
+
+    authors = (await session.exec(paginate(select_fields(Author, fields), Author.id, page))).all()
+    set_next_cursor(response, authors, page)
+    items = [{ field: getattr(author, field) for field in fields } for author in authors]
+    if "books" in relations:
+        books = await load_book_refs(session, [item["id"] for item in items], BookAuthor.author_id)
+        for item in items:
+            item["books"] = books[item["id"]]
+    return json_response(items, response)
+
+@author_router.get("/authors/batch", response_model=Batch[Author])
+async def get_authors_batch(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    ids: Annotated[List[int], Depends(parse_ids)],
+    field_params: Annotated[FieldParams, Depends(get_field_params)],
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
+):
+    fields = requested_fields(field_params, Author)
+    relations = requested_relations(field_params, ["books"])
+    models = [Author, Book, BookAuthor] if "books" in relations else [Author]
+    not_modified = await conditional_response(request, response, session, models)
+    if not_modified:
+        return not_modified
+
+    authors = (await session.exec(select_fields(Author, fields).where(Author.id.in_(ids)))).all()
+    items = [{ field: getattr(author, field) for field in fields } for author in authors]
+    if "books" in relations:
+        books = await load_book_refs(session, [item["id"] for item in items], BookAuthor.author_id)
+        for item in items:
+            item["books"] = books[item["id"]]
+    return json_response(batch_result(ids, items), response)
@@ -1,11 +1,16 @@
 from datetime import datetime
-from typing import Annotated, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Annotated, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from auth import get_current_active_user
-from db import get_session
+from batch import Batch, batch_result, parse_ids
+from config import COMMENT_PREVIEW_SIZE, MAX_PAGE_SIZE
+from db import get_async_session
+from fieldsets import FieldParams, get_field_params, requested_fields, requested_relations, select_fields
+from loaders import load_book_fields, load_books_with_authors
 from orm.author import Author
 from orm.book import Book
 from orm.comment import Comment
@@ -14,6 +19,10 @@ from orm.book_genre import BookGenre
 from orm.genre import Genre
 from orm.publisher import Publisher
 from orm.user import User, Role
+from pagination import INTEGER_MAX, INTEGER_MIN, PageParams, get_page_params, paginate, set_next_cursor
+from ratings import update_book_rating
+from responses import json_response
+from versions import bump_versions, conditional_response
 
 book_router = APIRouter()
 
@@ -42,52 +51,100 @@ class BookWithAuthors(BaseModel):
     image_url: Optional[str]
     publisher_id: Optional[int]
     created_at: datetime
+    average_rating: float
+    rating_count: int
+    approved_comment_count: int
     authors: List[Author]
     comments: List[Comment]
+    comment_count: int
     publisher: Optional[Publisher] = None
 
 class CommentCreate(BaseModel):
     comment_text: str
     rating: Optional[int] = None
 
+BOOK_SORT_FIELDS = {
+    "-average_rating": "average_rating",
+    "-approved_comment_count": "approved_comment_count"
+}
+
+BOOK_RELATIONS = ["authors", "genres", "publisher", "comments"]
+
+class BookFilter:
+    def __init__(
+        self,
+        genre_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        publisher_id: Optional[int] = None,
+        publication_year: Optional[int] = None
+    ):
+        self.genre_id = genre_id
+        self.author_id = author_id
+        self.publisher_id = publisher_id
+        self.publication_year = publication_year
+
+    def apply(self, query):
+        if self.genre_id is not None:
+            query = query.where(Book.id.in_(
+                select(BookGenre.book_id).where(BookGenre.genre_id == self.genre_id)
+            ))
+        if self.author_id is not None:
+            query = query.where(Book.id.in_(
+                select(BookAuthor.book_id).where(BookAuthor.author_id == self.author_id)
+            ))
+        if self.publisher_id is not None:
+            query = query.where(Book.publisher_id == self.publisher_id)
+        if self.publication_year is not None:
+            query = query.where(Book.publication_year == self.publication_year)
+        return query
+
+async def get_book_filter(
+    genre_id: Optional[int] = Query(default=None, ge=INTEGER_MIN, le=INTEGER_MAX),
+    author_id: Optional[int] = Query(default=None, ge=INTEGER_MIN, le=INTEGER_MAX),
+    publisher_id: Optional[int] = Query(default=None, ge=INTEGER_MIN, le=INTEGER_MAX),
+    publication_year: Optional[int] = Query(default=None, ge=INTEGER_MIN, le=INTEGER_MAX)
+):
+    return BookFilter(genre_id, author_id, publisher_id, publication_year)
+
 @book_router.post("/books", response_model=Book)
-def create_book(
+async def create_book(
     book: BookCreate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.EDITOR, Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    existing_publisher = session.exec(
+    existing_publisher = (await session.exec(
         select(Publisher).where(Publisher.id == book.publisher_id)
-    ).first()
+    )).first()
     if not existing_publisher:
         raise HTTPException(status_code=400, detail="Publisher not found")
 
     db_book = Book(**book.model_dump())
     session.add(db_book)
-    session.commit()
-    session.refresh(db_book)
+    await bump_versions(session, Book)
+    await session.commit()
+    await session.refresh(db_book)
     return db_book
 
 @book_router.put("/books/{book_id}", response_model=Book)
-def update_book(
+async def update_book(
     book_id: int,
     book: BookUpdate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.EDITOR, Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    existing_publisher = session.exec(
+    existing_publisher = (await session.exec(
         select(Publisher).where(Publisher.id == book.publisher_id)
-    ).first()
+    )).first()
     if not existing_publisher:
         raise HTTPException(status_code=400, detail="Publisher not found")
 
-    db_book = session.get(Book, book_id)
+    db_book = await session.get(Book, book_id)
     if not db_book:
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -96,138 +153,202 @@ def update_book(
         setattr(db_book, key, value)
 
     session.add(db_book)
-    session.commit()
-    session.refresh(db_book)
+    await bump_versions(session, Book)
+    await session.commit()
+    await session.refresh(db_book)
     return db_book
 
 @book_router.delete("/books/{book_id}")
-def delete_book(
+async def delete_book(
     book_id: int,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    db_book = session.get(Book, book_id)
+    db_book = await session.get(Book, book_id)
     if not db_book:
         raise HTTPException(status_code=404, detail="Book not found")
 
-    session.delete(db_book)
-    session.commit()
+    await session.delete(db_book)
+    await bump_versions(session, Book)
+    await session.commit()
     return { "ok": True }
 
 @book_router.get("/books", response_model=List[BookWithAuthors])
-def get_books(
+async def get_books(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    page: Annotated[PageParams, Depends(get_page_params)],
+    book_filter: Annotated[BookFilter, Depends(get_book_filter)],
+    field_params: Annotated[FieldParams, Depends(get_field_params)],
+    request: Request,
+    response: Response,
+    sort: Literal["id", "-average_rating", "-approved_comment_count"] = "id",
+    comments: int = Query(default=COMMENT_PREVIEW_SIZE, ge=0, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_async_session)
+):
+    fields = requested_fields(field_params, Book, hidden={"rating_sum"})
+    relations = requested_relations(field_params, BOOK_RELATIONS)
+    not_modified = await conditional_response(
+        request, response, session,
+        [Book, Author, Publisher, Comment, Genre, BookAuthor, BookGenre],
+        current_user.role in [Role.MODERATOR]
+    )
+    if not_modified:
+        return not_modified
+    sort_field = BOOK_SORT_FIELDS.get(sort)
+    sort_column = getattr(Book, sort_field) if sort_field else None
+
+    if not field_params.sparse:
+        books = (await session.exec(paginate(book_filter.apply(select(Book)), Book.id, page, sort_column))).all()
+        set_next_cursor(response, books, page, sort_field)
+        return json_response(await load_books_with_authors(
+            session, books, current_user.role in [Role.MODERATOR], comments
+        ), response)
+
+    extra = [sort_field] if sort_field else []
+    if "publisher" in relations:
+        extra.append("publisher_id")
+    query = book_filter.apply(select_fields(Book, fields, extra))
+    books = (await session.exec(paginate(query, Book.id, page, sort_column))).all()
+    set_next_cursor(response, books, page, sort_field)
+    return json_response(await load_book_fields(
+        session, books, fields, relations, current_user.role in [Role.MODERATOR], comments
+    ), response)
+
+@book_router.get("/books/batch", response_model=Batch[BookWithAuthors])
+async def get_books_batch(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    offset: int = Query(default=0, ge=0),
-    session: Session = Depends(get_session)
+    ids: Annotated[List[int], Depends(parse_ids)],
+    field_params: Annotated[FieldParams, Depends(get_field_params)],
+    request: Request,
+    response: Response,
+    comments: int = Query(default=COMMENT_PREVIEW_SIZE, ge=0, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    books = session.exec(
-        select(Book)
-        .offset(offset)
-        .limit(10)
-    ).all()
-
-    result = []
-    for book in books:
-        publisher = None
-        if book.publisher_id:
-            publisher = session.get(Publisher, book.publisher_id)
-
-        authors = session.exec(
-            select(Author)
-            .join(BookAuthor)
-            .where(BookAuthor.book_id == book.id)
-        ).all()
-
-        comments = session.exec(
-            select(Comment)
-            .where((Comment.book_id == book.id) & ((Comment.is_approved == True) | (current_user.role in [Role.MODERATOR])))
-        ).all()
-
-        book_dict = book.model_dump()
-        book_dict["authors"] = [author.model_dump() for author in authors]
-        book_dict["comments"] = [comment.model_dump() for comment in comments]
-        book_dict["publisher"] = publisher.model_dump()
-        result.append(book_dict)
-
-    return result
+    fields = requested_fields(field_params, Book, hidden={"rating_sum"})
+    relations = requested_relations(field_params, BOOK_RELATIONS)
+    not_modified = await conditional_response(
+        request, response, session,
+        [Book, Author, Publisher, Comment, Genre, BookAuthor, BookGenre],
+        current_user.role in [Role.MODERATOR]
+    )
+    if not_modified:
+        return not_modified
+
+    if not field_params.sparse:
+        books = (await session.exec(select(Book).where(Book.id.in_(ids)))).all()
+        items = await load_books_with_authors(session, books, current_user.role in [Role.MODERATOR], comments)
+        return json_response(batch_result(ids, items), response)
+
+    extra = ["publisher_id"] if "publisher" in relations else []
+    books = (await session.exec(select_fields(Book, fields, extra).where(Book.id.in_(ids)))).all()
+    items = await load_book_fields(session, books, fields, relations, current_user.role in [Role.MODERATOR], comments)
+    return json_response(batch_result(ids, items), response)
 
 @book_router.post("/books/{book_id}/authors/{author_id}")
-def add_author_to_book(
+async def add_author_to_book(
     book_id: int,
     author_id: int,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.EDITOR, Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    book = session.get(Book, book_id)
+    book = await session.get(Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
-    author = session.get(Author, author_id)
+    author = await session.get(Author, author_id)
     if not author:
         raise HTTPException(status_code=404, detail="Author not found")
 
-    existing = session.exec(
+    existing = (await session.exec(
         select(BookAuthor).where(
             BookAuthor.book_id == book_id,
             BookAuthor.author_id == author_id
         )
-    ).first()
+    )).first()
 
     if existing:
         raise HTTPException(status_code=400, detail="Relationship already exists")
 
     book_author = BookAuthor(book_id=book_id, author_id=author_id)
     session.add(book_author)
-    session.commit()
+    await bump_versions(session, BookAuthor)
+    await session.commit()
     return {"ok": True}
 
 @book_router.post("/books/{book_id}/genres/{genre_id}")
-def add_genre_to_book(
+async def add_genre_to_book(
     book_id: int,
     genre_id: int,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.EDITOR, Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    book = session.get(Book, book_id)
+    book = await session.get(Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
-    genre = session.get(Genre, genre_id)
+    genre = await session.get(Genre, genre_id)
     if not genre:
         raise HTTPException(status_code=404, detail="Genre not found")
 
-    existing = session.exec(
+    existing = (await session.exec(
         select(BookGenre).where(
             BookGenre.book_id == book_id,
             BookGenre.genre_id == genre_id
         )
-    ).first()
+    )).first()
 
     if existing:
         raise HTTPException(status_code=400, detail="Relationship already exists")
 
     book_genre = BookGenre(book_id=book_id, genre_id=genre_id)
     session.add(book_genre)
-    session.commit()
+    await bump_versions(session, BookGenre)
+    await session.commit()
     return { "ok": True }
 
+@book_router.get("/books/{book_id}/comments", response_model=List[Comment])
+async def get_book_comments(
+    book_id: int,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    page: Annotated[PageParams, Depends(get_page_params)],
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
+):
+    book = await session.get(Book, book_id)
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+    not_modified = await conditional_response(
+        request, response, session, [Comment], current_user.role in [Role.MODERATOR]
+    )
+    if not_modified:
+        return not_modified
+
+    query = select(Comment).where(Comment.book_id == book_id)
+    if current_user.role not in [Role.MODERATOR]:
+        query = query.where(Comment.is_approved == True)
+    comments = (await session.exec(paginate(query, Comment.id, page))).all()
+    set_next_cursor(response, comments, page)
+    return comments
+
 @book_router.post("/books/{book_id}/comments", response_model=Comment)
-def add_comment(
+async def add_comment(
     book_id: int,
     comment: CommentCreate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    book = session.get(Book, book_id)
+    book = await session.get(Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -239,6 +360,9 @@ def add_comment(
         is_approved=current_user.role in [Role.EDITOR, Role.MODERATOR]
     )
     session.add(db_comment)
-    session.commit()
-    session.refresh(db_comment)
+    if db_comment.is_approved:
+        await update_book_rating(session, db_comment, 1)
+    await bump_versions(session, Comment)
+    await session.commit()
+    await session.refresh(db_comment)
     return db_comment
@@ -0,0 +1,204 @@
+import csv
+from io import StringIO
+import json
+from typing import Annotated, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import Field, ValidationError
+from sqlalchemy import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from auth import get_current_active_user
+from config import BULK_MAX_BYTES, BULK_MAX_ROWS, EXPORT_BATCH_SIZE
+from db import async_engine, get_async_session
+from loaders import load_authors, load_genres, load_publishers
+from orm.author import Author
+from orm.book import Book
+from orm.book_author import BookAuthor
+from orm.book_genre import BookGenre
+from orm.genre import Genre
+from orm.publisher import Publisher
+from orm.user import User, Role
+from pagination import INTEGER_MAX, INTEGER_MIN
+from routers.book_router import BookCreate
+from versions import bump_versions
+
+catalog_router = APIRouter()
+
+EXPORT_COLUMNS = [
+    "id", "title", "publication_year", "page_count", "description", "image_url",
+    "publisher_id", "publisher", "authors", "genres", "average_rating", "rating_count",
+    "approved_comment_count", "created_at"
+]
+
+IntegerId = Annotated[int, Field(ge=INTEGER_MIN, le=INTEGER_MAX)]
+
+class BookImport(BookCreate):
+    title: str = Field(max_length=100)
+    publication_year: Optional[int] = Field(default=None, ge=INTEGER_MIN, le=INTEGER_MAX)
+    page_count: Optional[int] = Field(default=None, ge=INTEGER_MIN, le=INTEGER_MAX)
+    description: Optional[str] = Field(default=None, max_length=2000)
+    image_url: Optional[str] = Field(default=None, max_length=200)
+    publisher_id: Optional[IntegerId] = None
+    author_ids: List[IntegerId] = []
+    genre_ids: List[IntegerId] = []
+
+def too_many_rows():
+    return HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per import")
+
+async def read_chunks(request: Request):
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > BULK_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_BYTES} bytes per import")
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > BULK_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_BYTES} bytes per import")
+        yield chunk
+
+async def read_ndjson_rows(request: Request):
+    rows = []
+    buffer = b""
+    async for chunk in read_chunks(request):
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            if line.strip():
+                if len(rows) == BULK_MAX_ROWS:
+                    raise too_many_rows()
+                rows.append(json.loads(line))
+    if buffer.strip():
+        if len(rows) == BULK_MAX_ROWS:
+            raise too_many_rows()
+        rows.append(json.loads(buffer))
+    return rows
+
+async def read_import_rows(request: Request):
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            rows = await read_ndjson_rows(request)
+        else:
+            rows = json.loads(b"".join([chunk async for chunk in read_chunks(request)]))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed JSON")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array or NDJSON")
+    if len(rows) > BULK_MAX_ROWS:
+        raise too_many_rows()
+    return rows
+
+async def existing_ids(session: AsyncSession, model, ids):
+    if not ids:
+        return set()
+    return set((await session.exec(select(model.id).where(model.id.in_(ids)))).all())
+
+@catalog_router.post("/books/bulk")
+async def import_books(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: AsyncSession = Depends(get_async_session)
+):
+    if current_user.role not in [Role.EDITOR, Role.MODERATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    errors = []
+    items = []
+    for index, row in enumerate(await read_import_rows(request)):
+        try:
+            items.append((index, BookImport.model_validate(row)))
+        except ValidationError as error:
+            errors.append({ "index": index, "detail": error.errors(include_url=False, include_context=False) })
+
+    publisher_ids = await existing_ids(session, Publisher, {item.publisher_id for _, item in items})
+    author_ids = await existing_ids(session, Author, {i for _, item in items for i in item.author_ids})
+    genre_ids = await existing_ids(session, Genre, {i for _, item in items for i in item.genre_ids})
+
+    valid = []
+    for index, item in items:
+        if item.publisher_id not in publisher_ids:
+            errors.append({ "index": index, "detail": "Publisher not found" })
+        elif not author_ids.issuperset(item.author_ids):
+            errors.append({ "index": index, "detail": "Author not found" })
+        elif not genre_ids.issuperset(item.genre_ids):
+            errors.append({ "index": index, "detail": "Genre not found" })
+        else:
+            valid.append((index, item))
+
+    created = []
+    if valid:
+        book_rows = [
+            Book(**item.model_dump(exclude={"author_ids", "genre_ids"})).model_dump(exclude={"id"})
+            for _, item in valid
+        ]
+        book_ids = (await session.exec(
+            insert(Book).returning(Book.id, sort_by_parameter_order=True),
+            params=book_rows
+        )).scalars().all()
+
+        author_rows = [
+            { "book_id": book_id, "author_id": author_id }
+            for book_id, (_, item) in zip(book_ids, valid) for author_id in set(item.author_ids)
+        ]
+        genre_rows = [
+            { "book_id": book_id, "genre_id": genre_id }
+            for book_id, (_, item) in zip(book_ids, valid) for genre_id in set(item.genre_ids)
+        ]
+        if author_rows:
+            await session.exec(insert(BookAuthor), params=author_rows)
+        if genre_rows:
+            await session.exec(insert(BookGenre), params=genre_rows)
+
+        await bump_versions(session, Book, BookAuthor, BookGenre)
+        await session.commit()
+        created = [{ "index": index, "id": book_id } for book_id, (index, _) in zip(book_ids, valid)]
+
+    errors.sort(key=lambda error: error["index"])
+    return { "created": created, "errors": errors }
+
+async def export_batches():
+    async with AsyncSession(async_engine) as session:
+        result = await session.stream_scalars(
+            select(Book).order_by(Book.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for books in result.partitions():
+            publishers = await load_publishers(session, books)
+            authors = await load_authors(session, books)
+            genres = await load_genres(session, books)
+            yield [
+                {
+                    **book.model_dump(mode="json", exclude={"rating_sum"}),
+                    "publisher": publishers[book.publisher_id].name if book.publisher_id in publishers else None,
+                    "authors": [f"{author.first_name} {author.last_name}" for author in authors[book.id]],
+                    "genres": [genre.name for genre in genres[book.id]]
+                }
+                for book in books
+            ]
+            session.expunge_all()
+
+async def export_ndjson():
+    async for batch in export_batches():
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in batch)
+
+async def export_csv():
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    async for batch in export_batches():
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            writer.writerow({ **row, "authors": "; ".join(row["authors"]), "genres": "; ".join(row["genres"]) })
+        yield buffer.getvalue()
+
+@catalog_router.get("/books/export")
+async def export_books(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    export_format: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format")
+):
+    if export_format == "csv":
+        return StreamingResponse(export_csv(), media_type="text/csv", headers={
+            "Content-Disposition": 'attachment; filename="books.csv"'
+        })
+    return StreamingResponse(export_ndjson(), media_type="application/x-ndjson")
@@ -1,12 +1,20 @@
 from typing import Annotated, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from auth import get_current_active_user
-from db import get_session
+from batch import Batch, batch_result, parse_ids
+from db import get_async_session
+from fieldsets import FieldParams, get_field_params, requested_fields, requested_relations, select_fields
+from loaders import load_book_refs
+from orm.book import Book
+from orm.book_genre import BookGenre
 from orm.genre import Genre
 from orm.user import User, Role
+from pagination import PageParams, get_page_params, paginate, set_next_cursor
+from responses import json_response
+from versions import bump_versions, conditional_response
 
 genre_router = APIRouter()
 
@@ -19,31 +27,32 @@ class GenreUpdate(BaseModel):
     description: Optional[str] = None
 
 @genre_router.post("/genres", response_model=Genre)
-def create_genre(
+async def create_genre(
     genre: GenreCreate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
     db_genre = Genre(**genre.model_dump())
     session.add(db_genre)
-    session.commit()
-    session.refresh(db_genre)
+    await bump_versions(session, Genre)
+    await session.commit()
+    await session.refresh(db_genre)
     return db_genre
 
 @genre_router.put("/genres/{genre_id}", response_model=Genre)
-def update_genre(
+async def update_genre(
     genre_id: int,
     genre: GenreUpdate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    db_genre = session.get(Genre, genre_id)
+    db_genre = await session.get(Genre, genre_id)
     if not db_genre:
         raise HTTPException(status_code=404, detail="Genre not found")
 
@@ -52,36 +61,74 @@ def update_genre(
         setattr(db_genre, key, value)
 
     session.add(db_genre)
-    session.commit()
-    session.refresh(db_genre)
+    await bump_versions(session, Genre)
+    await session.commit()
+    await session.refresh(db_genre)
     return db_genre
 
 @genre_router.delete("/genres/{genre_id}")
-def delete_genre(
+async def delete_genre(
     genre_id: int,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    db_genre = session.get(Genre, genre_id)
+    db_genre = await session.get(Genre, genre_id)
     if not db_genre:
         raise HTTPException(status_code=404, detail="Genre not found")
 
-    session.delete(db_genre)
-    session.commit()
+    await session.delete(db_genre)
+    await bump_versions(session, Genre)
+    await session.commit()
     return { "ok": True }
 
 @genre_router.get("/genres/", response_model=List[Genre])
-def get_genres(
+async def get_genres(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    offset: int = Query(default=0, ge=0),
-    session: Session = Depends(get_session)
+    page: Annotated[PageParams, Depends(get_page_params)],
+    field_params: Annotated[FieldParams, Depends(get_field_params)],
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
 ):
-    genres = session.exec(
-        select(Genre)
-        .offset(offset)
-        .limit(10)
-    ).all()
-    return genres
+    fields = requested_fields(field_params, Genre)
+    relations = requested_relations(field_params, ["books"])
+    models = [Genre, Book, BookGenre] if "books" in relations else [Genre]
+    not_modified = await conditional_response(request, response, session, models)
+    if not_modified:
+        return not_modified
+
+    genres = (await session.exec(paginate(select_fields(Genre, fields), Genre.id, page))).all()
+    set_next_cursor(response, genres, page)
+    items = [{ field: getattr(genre, field) for field in fields } for genre in genres]
+    if "books" in relations:
+        books = await load_book_refs(session, [item["id"] for item in items], BookGenre.genre_id)
+        for item in items:
+            item["books"] = books[item["id"]]
+    return json_response(items, response)
+
+@genre_router.get("/genres/batch", response_model=Batch[Genre])
+async def get_genres_batch(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    ids: Annotated[List[int], Depends(parse_ids)],
+    field_params: Annotated[FieldParams, Depends(get_field_params)],
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
+):
+    fields = requested_fields(field_params, Genre)
+    relations = requested_relations(field_params, ["books"])
+    models = [Genre, Book, BookGenre] if "books" in relations else [Genre]
+    not_modified = await conditional_response(request, response, session, models)
+    if not_modified:
+        return not_modified
+
+    genres = (await session.exec(select_fields(Genre, fields).where(Genre.id.in_(ids)))).all()
+    items = [{ field: getattr(genre, field) for field in fields } for genre in genres]
+    if "books" in relations:
+        books = await load_book_refs(session, [item["id"] for item in items], BookGenre.genre_id)
+        for item in items:
+            item["books"] = books[item["id"]]
+    return json_response(batch_result(ids, items), response)
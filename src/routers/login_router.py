@@ -1,27 +1,51 @@
 from typing import Annotated
 from fastapi import Depends, APIRouter, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlmodel import delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from auth import generate_random_token, verify_password
-from db import get_session
+from auth import generate_random_token, hash_password, password_needs_rehash, token_expiry, verify_password
+from config import MAX_SESSIONS_PER_USER, SESSION_TOKEN_TTL, SIGNED_TOKENS
+from db import get_async_session
 from orm.user import User
 from orm.token import Token
+from signed_tokens import create_signed_token
+from token_cache import token_cache
 
 login_router = APIRouter()
 
 @login_router.post("/login")
-async def post_login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == form_data.username)).first()
-    if not user or not verify_password(form_data.password, user.password):
+async def post_login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], session: AsyncSession = Depends(get_async_session)):
+    user = (await session.exec(select(User).where(User.email == form_data.username))).first()
+    if not user or not await verify_password(form_data.password, user.password):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
+    if password_needs_rehash(user.password):
+        user.password = await hash_password(form_data.password)
+        session.add(user)
+    if SIGNED_TOKENS:
+        await session.commit()
+        return { "access_token": create_signed_token(user) }
+
+    evicted = []
+    if MAX_SESSIONS_PER_USER > 0:
+        evicted = (await session.exec(
+            select(Token.token)
+            .where(Token.user_id == user.id, Token.is_active == True)
+            .order_by(Token.id.desc())
+            .offset(MAX_SESSIONS_PER_USER - 1)
+        )).all()
+    if evicted:
+        await session.exec(delete(Token).where(Token.token.in_(evicted)))
+
     access_token = generate_random_token()
     token = Token(
         token=access_token,
         user_id=user.id,
-        is_active=True
+        is_active=True,
+        expires_at=token_expiry(SESSION_TOKEN_TTL)
     )
     session.add(token)
-    session.commit()
-    session.refresh(token)
+    await session.commit()
+    for evicted_token in evicted:
+        token_cache.invalidate_token(evicted_token)
     return { "access_token": access_token }
@@ -1,12 +1,19 @@
 from typing import Annotated, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from auth import get_current_active_user
-from db import get_session
+from batch import Batch, batch_result, parse_ids
+from db import get_async_session
+from fieldsets import FieldParams, get_field_params, requested_fields, requested_relations, select_fields
+from loaders import load_book_refs
+from orm.book import Book
 from orm.publisher import Publisher
 from orm.user import User, Role
+from pagination import PageParams, get_page_params, paginate, set_next_cursor
+from responses import json_response
+from versions import bump_versions, conditional_response
 
 publisher_router = APIRouter()
 
@@ -21,31 +28,32 @@ class PublisherUpdate(BaseModel):
     phone: Optional[str] = None
 
 @publisher_router.post("/publishers/", response_model=Publisher)
-def create_publisher(
+async def create_publisher(
     publisher: PublisherCreate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.EDITOR, Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
     db_publisher = Publisher(**publisher.model_dump())
     session.add(db_publisher)
-    session.commit()
-    session.refresh(db_publisher)
+    await bump_versions(session, Publisher)
+    await session.commit()
+    await session.refresh(db_publisher)
     return db_publisher
 
 @publisher_router.put("/publishers/{publisher_id}", response_model=Publisher)
-def update_publisher(
+async def update_publisher(
     publisher_id: int,
     publisher: PublisherUpdate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.EDITOR, Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    db_publisher = session.get(Publisher, publisher_id)
+    db_publisher = await session.get(Publisher, publisher_id)
     if not db_publisher:
         raise HTTPException(status_code=404, detail="Publisher not found")
 
@@ -54,36 +62,74 @@ def update_publisher(
         setattr(db_publisher, key, value)
 
     session.add(db_publisher)
-    session.commit()
-    session.refresh(db_publisher)
+    await bump_versions(session, Publisher)
+    await session.commit()
+    await session.refresh(db_publisher)
     return db_publisher
 
 @publisher_router.delete("/publishers/{publisher_id}")
-def delete_publisher(
+async def delete_publisher(
     publisher_id: int,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    db_publisher = session.get(Publisher, publisher_id)
+    db_publisher = await session.get(Publisher, publisher_id)
     if not db_publisher:
         raise HTTPException(status_code=404, detail="Publisher not found")
 
-    session.delete(db_publisher)
-    session.commit()
+    await session.delete(db_publisher)
+    await bump_versions(session, Publisher)
+    await session.commit()
     return { "ok": True }
 
-@publisher_router.get("/genres/", response_model=List[Publisher])
-def get_publishers(
+@publisher_router.get("/publishers/", response_model=List[Publisher])
+async def get_publishers(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    offset: int = Query(default=0, ge=0),
-    session: Session = Depends(get_session)
+    page: Annotated[PageParams, Depends(get_page_params)],
+    field_params: Annotated[FieldParams, Depends(get_field_params)],
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
 ):
-    publishers = session.exec(
-        select(Publisher)
-        .offset(offset)
-        .limit(10)
-    ).all()
-    return publishers
+    fields = requested_fields(field_params, Publisher)
+    relations = requested_relations(field_params, ["books"])
+    models = [Publisher, Book] if "books" in relations else [Publisher]
+    not_modified = await conditional_response(request, response, session, models)
+    if not_modified:
+        return not_modified
+
+    publishers = (await session.exec(paginate(select_fields(Publisher, fields), Publisher.id, page))).all()
+    set_next_cursor(response, publishers, page)
+    items = [{ field: getattr(publisher, field) for field in fields } for publisher in publishers]
+    if "books" in relations:
+        books = await load_book_refs(session, [item["id"] for item in items], Book.publisher_id)
+        for item in items:
+            item["books"] = books[item["id"]]
+    return json_response(items, response)
+
+@publisher_router.get("/publishers/batch", response_model=Batch[Publisher])
+async def get_publishers_batch(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    ids: Annotated[List[int], Depends(parse_ids)],
+    field_params: Annotated[FieldParams, Depends(get_field_params)],
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
+):
+    fields = requested_fields(field_params, Publisher)
+    relations = requested_relations(field_params, ["books"])
+    models = [Publisher, Book] if "books" in relations else [Publisher]
+    not_modified = await conditional_response(request, response, session, models)
+    if not_modified:
+        return not_modified
+
+    publishers = (await session.exec(select_fields(Publisher, fields).where(Publisher.id.in_(ids)))).all()
+    items = [{ field: getattr(publisher, field) for field in fields } for publisher in publishers]
+    if "books" in relations:
+        books = await load_book_refs(session, [item["id"] for item in items], Book.publisher_id)
+        for item in items:
+            item["books"] = books[item["id"]]
+    return json_response(batch_result(ids, items), response)
@@ -1,10 +1,11 @@
 from typing import Annotated, Optional
 from fastapi import APIRouter, Depends, Form, HTTPException
 from pydantic import BaseModel, Field, EmailStr
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from auth import hash_password
-from db import get_session
+from db import get_async_session
 from orm.user import User
 
 register_router = APIRouter()
@@ -17,13 +18,13 @@ class RegisterUser(BaseModel):
     password: str = Field(min_length=6, max_length=100)
 
 @register_router.post("/register")
-def post_register(user_data: Annotated[RegisterUser, Form()], session: Session = Depends(get_session)):
-    existing_user = session.exec(
+async def post_register(user_data: Annotated[RegisterUser, Form()], session: AsyncSession = Depends(get_async_session)):
+    existing_user = (await session.exec(
         select(User).where(User.email == user_data.email)
-    ).first()
+    )).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     user = User(
         first_name=user_data.first_name,
         last_name=user_data.last_name,
@@ -32,6 +33,6 @@ def post_register(user_data: Annotated[RegisterUser, Form()], session: Session =
         password=hashed_password
     )
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     return { "message": "User registered successfully" }
@@ -1,37 +1,96 @@
 from datetime import datetime
-from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from sqlmodel import Session, select
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import BaseModel, Field
+from sqlmodel import delete, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from auth import get_current_active_user
-from db import get_session
+from config import BULK_MAX_ROWS
+from db import get_async_session
 from orm.comment import Comment
 from orm.report import Report
 from orm.user import User, Role
+from pagination import BIGINT_MAX, BIGINT_MIN, PageParams, get_page_params, paginate, set_next_cursor
+from ratings import update_book_rating, update_book_ratings
+from signed_tokens import revocations
+from token_cache import token_cache
+from versions import bump_versions
 
 report_router = APIRouter()
 
 class ReportCreate(BaseModel):
     reason_text: str
 
+class ModerationBatch(BaseModel):
+    ids: List[Annotated[int, Field(ge=BIGINT_MIN, le=BIGINT_MAX)]] = Field(min_length=1, max_length=BULK_MAX_ROWS)
+
+class ModerationFilter:
+    def __init__(
+        self,
+        comment_id: Optional[int] = None,
+        book_id: Optional[int] = None,
+        user_id: Optional[int] = None
+    ):
+        self.comment_id = comment_id
+        self.book_id = book_id
+        self.user_id = user_id
+
+    def apply_reports(self, query):
+        if self.comment_id is not None:
+            query = query.where(Report.comment_id == self.comment_id)
+        if self.book_id is not None:
+            query = query.where(Report.comment_id.in_(
+                select(Comment.id).where(Comment.book_id == self.book_id)
+            ))
+        if self.user_id is not None:
+            query = query.where(Report.user_id == self.user_id)
+        return query
+
+    def apply_comments(self, query):
+        if self.comment_id is not None:
+            query = query.where(Comment.id == self.comment_id)
+        if self.book_id is not None:
+            query = query.where(Comment.book_id == self.book_id)
+        if self.user_id is not None:
+            query = query.where(Comment.user_id == self.user_id)
+        return query
+
+async def get_moderation_filter(
+    comment_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    user_id: Optional[int] = None
+):
+    return ModerationFilter(comment_id, book_id, user_id)
+
+def moderation_results(ids, changed, status, existing=(), unchanged_status=None):
+    results = []
+    for id in dict.fromkeys(ids):
+        if id in changed:
+            results.append({ "id": id, "status": status })
+        elif id in existing:
+            results.append({ "id": id, "status": unchanged_status })
+        else:
+            results.append({ "id": id, "status": "not_found" })
+    return { "results": results }
+
 @report_router.post("/comments/{comment_id}/reports", response_model=Report)
-def report_comment(
+async def report_comment(
     comment_id: int,
     report: ReportCreate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    comment = session.get(Comment, comment_id)
+    comment = await session.get(Comment, comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
 
-    existing = session.exec(
+    existing = (await session.exec(
         select(Report).where(
             Report.comment_id == comment_id,
             Report.user_id == current_user.id
         )
-    ).first()
+    )).first()
 
     if existing:
         raise HTTPException(status_code=400, detail="You already reported this comment")
@@ -42,74 +101,198 @@ def report_comment(
         reason_text=report.reason_text
     )
     session.add(db_report)
-    session.commit()
-    session.refresh(db_report)
+    await session.commit()
+    await session.refresh(db_report)
     return db_report
 
 @report_router.get("/reports/", response_model=List[Report])
-def list_reports(
+async def list_reports(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    page: Annotated[PageParams, Depends(get_page_params)],
+    moderation_filter: Annotated[ModerationFilter, Depends(get_moderation_filter)],
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    reports = session.exec(select(Report).where(Report.resolved_at == None)).all()
+    query = moderation_filter.apply_reports(select(Report).where(Report.resolved_at == None))
+    reports = (await session.exec(paginate(query, Report.id, page))).all()
+    set_next_cursor(response, reports, page)
     return reports
 
+@report_router.get("/comments/pending", response_model=List[Comment])
+async def list_pending_comments(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    page: Annotated[PageParams, Depends(get_page_params)],
+    moderation_filter: Annotated[ModerationFilter, Depends(get_moderation_filter)],
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
+):
+    if current_user.role not in [Role.MODERATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    query = moderation_filter.apply_comments(select(Comment).where(Comment.is_approved == False))
+    comments = (await session.exec(paginate(query, Comment.id, page))).all()
+    set_next_cursor(response, comments, page)
+    return comments
+
 @report_router.post("/reports/{report_id}/approve")
-def approve_report(
+async def approve_report(
     report_id: int,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    report = session.get(Report, report_id)
+    report = await session.get(Report, report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
 
-    comment = session.get(Comment, report.comment_id)
+    comment = await session.get(Comment, report.comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
 
     report.resolved_at = datetime.now()
 
-    session.delete(comment)
+    if comment.is_approved:
+        await update_book_rating(session, comment, -1)
+    await session.delete(comment)
 
     session.add(report)
-    session.commit()
+    await bump_versions(session, Comment)
+    await session.commit()
     return { "ok": True }
 
 @report_router.post("/comments/{comment_id}/approve")
-def approve_comment(
+async def approve_comment(
     comment_id: int,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    comment = session.get(Comment, comment_id)
-    if not comment:
-        raise HTTPException(status_code=404, detail="Comment not found")
+    approved = (await session.exec(
+        update(Comment)
+        .where(Comment.id == comment_id, Comment.is_approved == False)
+        .values(is_approved=True)
+        .returning(Comment.id, Comment.book_id, Comment.rating)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if not approved:
+        comment = await session.get(Comment, comment_id)
+        if not comment:
+            raise HTTPException(status_code=404, detail="Comment not found")
+        return { "ok": True }
 
-    comment.is_approved = True
-    session.add(comment)
-    session.commit()
+    await update_book_ratings(session, [approved], 1)
+    await bump_versions(session, Comment)
+    await session.commit()
     return { "ok": True }
 
+@report_router.post("/comments/approve")
+async def approve_comments(
+    batch: ModerationBatch,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: AsyncSession = Depends(get_async_session)
+):
+    if current_user.role not in [Role.MODERATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    approved = (await session.exec(
+        update(Comment)
+        .where(Comment.id.in_(batch.ids), Comment.is_approved == False)
+        .values(is_approved=True)
+        .returning(Comment.id, Comment.book_id, Comment.rating)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await update_book_ratings(session, approved, 1)
+    existing = set((await session.exec(select(Comment.id).where(Comment.id.in_(batch.ids)))).all())
+    await bump_versions(session, Comment)
+    await session.commit()
+    return moderation_results(batch.ids, {comment.id for comment in approved}, "approved", existing, "already_approved")
+
+@report_router.post("/comments/reject")
+async def reject_comments(
+    batch: ModerationBatch,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: AsyncSession = Depends(get_async_session)
+):
+    if current_user.role not in [Role.MODERATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    rejected = (await session.exec(
+        delete(Comment)
+        .where(Comment.id.in_(batch.ids))
+        .returning(Comment.id, Comment.book_id, Comment.rating, Comment.is_approved)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await update_book_ratings(session, [comment for comment in rejected if comment.is_approved], -1)
+    await bump_versions(session, Comment)
+    await session.commit()
+    return moderation_results(batch.ids, {comment.id for comment in rejected}, "rejected")
+
+@report_router.post("/reports/approve")
+async def approve_reports(
+    batch: ModerationBatch,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: AsyncSession = Depends(get_async_session)
+):
+    if current_user.role not in [Role.MODERATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    reports = (await session.exec(
+        update(Report)
+        .where(Report.id.in_(batch.ids), Report.resolved_at == None)
+        .values(resolved_at=datetime.now())
+        .returning(Report.id, Report.comment_id)
+        .execution_options(synchronize_session=False)
+    )).all()
+    existing = set((await session.exec(select(Report.id).where(Report.id.in_(batch.ids)))).all())
+    if reports:
+        removed = (await session.exec(
+            delete(Comment)
+            .where(Comment.id.in_({report.comment_id for report in reports}))
+            .returning(Comment.book_id, Comment.rating, Comment.is_approved)
+            .execution_options(synchronize_session=False)
+        )).all()
+        await update_book_ratings(session, [comment for comment in removed if comment.is_approved], -1)
+    await bump_versions(session, Comment)
+    await session.commit()
+    return moderation_results(batch.ids, {report.id for report in reports}, "approved", existing, "already_resolved")
+
+@report_router.post("/reports/reject")
+async def reject_reports(
+    batch: ModerationBatch,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: AsyncSession = Depends(get_async_session)
+):
+    if current_user.role not in [Role.MODERATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    rejected = (await session.exec(
+        update(Report)
+        .where(Report.id.in_(batch.ids), Report.resolved_at == None)
+        .values(resolved_at=datetime.now())
+        .returning(Report.id)
+        .execution_options(synchronize_session=False)
+    )).all()
+    existing = set((await session.exec(select(Report.id).where(Report.id.in_(batch.ids)))).all())
+    await session.commit()
+    return moderation_results(batch.ids, {report.id for report in rejected}, "rejected", existing, "already_resolved")
+
 @report_router.post("/users/{user_id}/block")
-def block_user(
+async def block_user(
     user_id: int,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if current_user.role not in [Role.MODERATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -118,5 +301,7 @@ def block_user(
 
     user.is_active = False
     session.add(user)
-    session.commit()
+    await session.commit()
+    token_cache.invalidate_user(user_id)
+    revocations.revoke_user(user_id)
     return { "ok": True }
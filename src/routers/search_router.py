@@ -0,0 +1,56 @@
+from typing import Annotated, List
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from sqlalchemy import case, func, literal_column, or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from auth import get_current_active_user
+from db import get_async_session
+from orm.author import Author
+from orm.book import Book
+from orm.user import User
+
+search_router = APIRouter()
+
+class SearchResult(BaseModel):
+    books: List[Book]
+    authors: List[Author]
+
+def full_text_search(model, q: str, trigram_column):
+    ts_query = func.websearch_to_tsquery("simple", q)
+    search_vector = literal_column(f"{model.__tablename__}.search_vector")
+    rank = func.ts_rank(search_vector, ts_query) + func.similarity(trigram_column, q)
+    return (
+        select(model)
+        .where(or_(search_vector.op("@@")(ts_query), trigram_column.op("%")(q)))
+        .order_by(rank.desc(), model.id)
+    )
+
+def like_search(model, q: str, columns):
+    pattern = q.lower()
+    matches = [func.lower(column).contains(pattern, autoescape=True) for column in columns]
+    rank = sum(case((match, len(matches) - i), else_=0) for i, match in enumerate(matches))
+    return (
+        select(model)
+        .where(or_(*matches))
+        .order_by(rank.desc(), model.id)
+    )
+
+@search_router.get("/search", response_model=SearchResult)
+async def search(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(default=10, ge=1, le=50),
+    session: AsyncSession = Depends(get_async_session)
+):
+    if session.get_bind().dialect.name == "postgresql":
+        books_query = full_text_search(Book, q, Book.title)
+        authors_query = full_text_search(Author, q, Author.last_name)
+    else:
+        books_query = like_search(Book, q, [Book.title, Book.description])
+        authors_query = like_search(Author, q, [Author.last_name, Author.first_name])
+
+    books = (await session.exec(books_query.limit(limit))).all()
+    authors = (await session.exec(authors_query.limit(limit))).all()
+    return { "books": books, "authors": authors }
@@ -1,13 +1,18 @@
+from datetime import datetime
 from typing import Annotated
 from fastapi import APIRouter, Depends, Form, HTTPException
 from pydantic import BaseModel, EmailStr
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from auth import generate_random_token, get_current_active_user, hash_password
-from db import get_session
-from mailer import send_email
+from auth import generate_random_token, get_current_active_user, hash_password, token_expiry
+from config import RESET_TOKEN_TTL
+from db import get_async_session
+from mailer import notify_mail_worker, queue_email
 from orm.token import Token
 from orm.user import User
+from signed_tokens import revocations
+from token_cache import token_cache
 
 user_router = APIRouter()
 
@@ -18,42 +23,50 @@ class UpdatePasswordRequest(BaseModel):
     password_token: str
 
 @user_router.get("/user")
-def get_user(current_user: Annotated[User, Depends(get_current_active_user)]):
+async def get_user(current_user: Annotated[User, Depends(get_current_active_user)], session: AsyncSession = Depends(get_async_session)):
+    user = await session.get(User, current_user.id)
     return {
-        "id": current_user.id,
-        "first_name": current_user.first_name,
-        "last_name": current_user.last_name,
-        "email": current_user.email,
-        "phone": current_user.phone
+        "id": user.id,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "email": user.email,
+        "phone": user.phone
     }
 
 @user_router.post("/reset_password")
-def post_reset_password(request_data: Annotated[ResetPasswordRequest, Form()], session: Session = Depends(get_session)):
-    user = session.exec(
+async def post_reset_password(request_data: Annotated[ResetPasswordRequest, Form()], session: AsyncSession = Depends(get_async_session)):
+    user = (await session.exec(
         select(User).where(User.email == request_data.email)
-    ).first()
+    )).first()
     if user:
         access_token = generate_random_token()
         token = Token(
             token=access_token,
-            user_id=user.id
+            user_id=user.id,
+            expires_at=token_expiry(RESET_TOKEN_TTL)
         )
         session.add(token)
-        session.commit()
-        session.refresh(token)
-        send_email(request_data.email, "Password Reset Key", f"Your password reset key: {token.token}")
+        queue_email(session, request_data.email, "Password Reset Key", f"Your password reset key: {access_token}")
+        await session.commit()
+        notify_mail_worker()
     return { "message": "Password reset key sent to your email if registered on the site" }
 
 @user_router.post("/update_password")
-def post_reset_password(request_data: Annotated[UpdatePasswordRequest, Form()], session: Session = Depends(get_session)):
-    token = session.exec(
-        select(Token).where(Token.token == request_data.password_token)
-    ).first()
+async def post_reset_password(request_data: Annotated[UpdatePasswordRequest, Form()], session: AsyncSession = Depends(get_async_session)):
+    token = (await session.exec(
+        select(Token).where(
+            Token.token == request_data.password_token, Token.is_active == False, Token.expires_at > datetime.now()
+        )
+    )).first()
     if not token:
         raise HTTPException(status_code=401, detail="Token not found")
-    session.delete(token)
+    user = await session.get(User, token.user_id)
+    await session.delete(token)
     password = generate_random_token(6)
-    token.user.password = hash_password(password)
-    session.commit()
-    send_email(token.user.email, "New Password", f"Your new password: {password}")
+    user.password = await hash_password(password)
+    queue_email(session, user.email, "New Password", f"Your new password: {password}")
+    await session.commit()
+    token_cache.invalidate_user(user.id)
+    revocations.revoke_user(user.id)
+    notify_mail_worker()
     return { "message": "Your new password has been sent to your email" }
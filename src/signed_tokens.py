@@ -0,0 +1,74 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from hashlib import sha256
+import hmac
+import json
+from threading import Lock
+from time import time
+
+from config import AUTH_SECRET_KEY, SIGNED_TOKEN_TTL
+from orm.user import Role, User
+
+class RevocationList:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._revoked = {}
+        self._lock = Lock()
+
+    def revoke_user(self, user_id: int):
+        now = time()
+        with self._lock:
+            self._revoked[user_id] = now
+            for expired in [key for key, revoked_at in self._revoked.items() if revoked_at < now - self.ttl]:
+                del self._revoked[expired]
+
+    def is_revoked(self, user_id: int, issued_at: float):
+        with self._lock:
+            revoked_at = self._revoked.get(user_id)
+        return revoked_at is not None and issued_at <= revoked_at
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+
+revocations = RevocationList(SIGNED_TOKEN_TTL)
+
+def encode(data: bytes):
+    return urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def decode(data: str):
+    return urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def sign(payload: str):
+    return encode(hmac.new(AUTH_SECRET_KEY.encode("utf-8"), payload.encode("ascii"), sha256).digest())
+
+def is_signed_token(token: str):
+    return "." in token
+
+def create_signed_token(user: User):
+    if not AUTH_SECRET_KEY:
+        raise RuntimeError("AUTH_SECRET_KEY must be set to issue signed tokens")
+    issued_at = time()
+    claims = {
+        "sub": user.id,
+        "role": int(user.role),
+        "active": user.is_active,
+        "iat": issued_at,
+        "exp": issued_at + SIGNED_TOKEN_TTL
+    }
+    payload = encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{sign(payload)}"
+
+def verify_signed_token(token: str):
+    if not AUTH_SECRET_KEY or not token.isascii():
+        return None
+    payload, _, signature = token.partition(".")
+    if not hmac.compare_digest(signature, sign(payload)):
+        return None
+    try:
+        claims = json.loads(decode(payload))
+    except (BinasciiError, ValueError):
+        return None
+    if claims["exp"] < time() or revocations.is_revoked(claims["sub"], claims["iat"]):
+        return None
+    return User(id=claims["sub"], role=Role(claims["role"]), is_active=claims["active"])
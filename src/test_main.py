@@ -1,9 +1,38 @@
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from hashlib import sha256
+from pathlib import Path
 from fastapi.testclient import TestClient
-from db import engine
+from sqlalchemy import event, text
+from sqlalchemy.dialects import postgresql
+from auth import password_needs_rehash
+from config import MAIL_MAX_ATTEMPTS, MAX_SESSIONS_PER_USER
+from db import async_engine, engine, get_async_session
+from mailer import MemoryTransport, deliver_pending, purge_dead_emails, queue_email
+from migrate import add_column_ddl
 from main import app
+from routers import catalog_router, login_router
+from routers.book_router import BookFilter
 import pytest
+from orm.book import Book
+from orm.comment import Comment
+from orm.outbox import OutboxEmail
+from orm.report import Report
+from orm.token import Token
 from orm.user import User, Role
-from sqlmodel import SQLModel, Session, select
+from pagination import encode_cursor
+from passwords import password_hasher
+from ratings import recompute_book_ratings
+from sqlmodel import SQLModel, Session, delete, func, select, update
+import signed_tokens
+from token_cache import token_cache
+from token_purge import purge_expired_tokens
 
 client = TestClient(app)
 
@@ -42,6 +71,28 @@ TEST_PUBLISHER_DATA = {
     "phone": "1234567890"
 }
 
+@contextmanager
+def count_queries():
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+def query_plan(session: Session, query):
+    dialect = session.get_bind().dialect
+    sql = str(query.compile(dialect=dialect, compile_kwargs={ "literal_binds": True }))
+    if dialect.name == "postgresql":
+        session.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = session.execute(text(f"EXPLAIN {sql}")).all()
+        session.rollback()
+    else:
+        plan = session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return " ".join(str(row) for row in plan)
+
 @pytest.fixture
 def session():
     SQLModel.metadata.create_all(engine)
@@ -148,3 +199,707 @@ def test_book(user_token):
     client.delete(f"/books/{book['id']}", headers={
         "Authorization": f"Bearer {user_token}"
     })
+
+def test_books_query_count(user_token, session: Session):
+    headers = { "Authorization": f"Bearer {user_token}" }
+
+    response = client.post("/publishers", json=TEST_PUBLISHER_DATA, headers=headers)
+    publisher = response.json()
+    response = client.post("/authors", json=TEST_AUTHOR_DATA, headers=headers)
+    author = response.json()
+
+    book_ids = []
+    for i in range(5):
+        book_data = {**TEST_BOOK_DATA, "title": f"Test Book {i}", "publisher_id": publisher["id"]}
+        book = client.post("/books", json=book_data, headers=headers).json()
+        client.post(f"/books/{book['id']}/authors/{author['id']}", headers=headers)
+        client.post(f"/books/{book['id']}/comments", json={ "comment_text": "Test", "rating": 5 }, headers=headers)
+        book_ids.append(book["id"])
+
+    total = session.exec(select(func.count(Book.id))).one()
+
+    # Страница из одной книги и полная страница стоят одинаковое число запросов
+    with count_queries() as single_page:
+        response = client.get("/books", params={ "offset": total - 1 }, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+    with count_queries() as full_page:
+        response = client.get("/books", params={ "offset": max(total - 10, 0) }, headers=headers)
+    assert response.status_code == 200
+    books = response.json()
+    assert len(books) == min(total, 10)
+    assert books[-1]["publisher"]["id"] == publisher["id"]
+    assert books[-1]["authors"][0]["id"] == author["id"]
+    assert len(books[-1]["comments"]) == 1
+
+    assert len(single_page) == len(full_page)
+
+    for book_id in book_ids:
+        client.delete(f"/books/{book_id}", headers=headers)
+    client.delete(f"/authors/{author['id']}", headers=headers)
+    client.delete(f"/publishers/{publisher['id']}", headers=headers)
+
+def test_cursor_pagination(user_token):
+    headers = { "Authorization": f"Bearer {user_token}" }
+
+    genre_ids = []
+    for i in range(3):
+        genre = client.post("/genres", json={**TEST_GENRE_DATA, "name": f"Test Genre {i}"}, headers=headers).json()
+        genre_ids.append(genre["id"])
+
+    seen = []
+    params = { "limit": 2 }
+    while True:
+        response = client.get("/genres/", params=params, headers=headers)
+        assert response.status_code == 200
+        seen.extend(genre["id"] for genre in response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params = { "limit": 2, "cursor": next_cursor }
+
+    assert seen == sorted(set(seen))
+    assert set(genre_ids) <= set(seen)
+
+    for cursor in ["not a cursor", encode_cursor(True), encode_cursor(2 ** 63)]:
+        response = client.get("/genres/", params={ "cursor": cursor }, headers=headers)
+        assert response.status_code == 400
+
+    for genre_id in genre_ids:
+        client.delete(f"/genres/{genre_id}", headers=headers)
+
+def test_blocked_user_token(user_token, session: Session):
+    other_user_data = {**TEST_USER_DATA, "email": "other@example.com"}
+    response = client.post("/register", data=other_user_data)
+    assert response.status_code == 200
+    response = client.post("/login", data={
+        "username": other_user_data["email"],
+        "password": other_user_data["password"]
+    })
+    other_token = response.json()["access_token"]
+    other_headers = { "Authorization": f"Bearer {other_token}" }
+
+    # Первый запрос кэширует токен, второй обслуживается из кэша
+    assert client.get("/user", headers=other_headers).status_code == 200
+    assert client.get("/user", headers=other_headers).status_code == 200
+
+    other_user = session.exec(
+        select(User).where(User.email == other_user_data["email"])
+    ).first()
+    response = client.post(f"/users/{other_user.id}/block", headers={
+        "Authorization": f"Bearer {user_token}"
+    })
+    assert response.status_code == 200
+    assert client.get("/user", headers=other_headers).status_code == 403
+
+    assert client.get("/user", headers={ "Authorization": "Bearer invalid" }).status_code == 401
+
+    session.refresh(other_user)
+    session.delete(other_user)
+    session.commit()
+
+def test_reset_password_email(session: Session):
+    response = client.post("/register", data=TEST_USER_DATA)
+    assert response.status_code == 200
+
+    response = client.post("/reset_password", data={ "email": TEST_USER_DATA["email"] })
+    assert response.status_code == 200
+
+    transport = MemoryTransport()
+    deliver_pending(session, transport)
+    assert TEST_USER_DATA["email"] in [to_email for to_email, _ in transport.messages]
+    assert session.exec(select(OutboxEmail)).first() is None
+
+    # Токен входа не подходит для сброса пароля
+    session_token = client.post("/login", data={
+        "username": TEST_USER_DATA["email"],
+        "password": TEST_USER_DATA["password"]
+    }).json()["access_token"]
+    response = client.post("/update_password", data={ "password_token": session_token })
+    assert response.status_code == 401
+
+    reset_key = transport.messages[-1][1].get_payload()[0].get_payload().rsplit(" ", 1)[-1]
+    response = client.post("/update_password", data={ "password_token": reset_key })
+    assert response.status_code == 200
+    session.exec(delete(OutboxEmail))
+    session.commit()
+
+    user = session.exec(
+        select(User).where(User.email == TEST_USER_DATA["email"])
+    ).first()
+    session.delete(user)
+    session.commit()
+
+def test_mail_delivery_failure(session: Session):
+    class AsciiOnlyTransport(MemoryTransport):
+        def send(self, to_email, message):
+            to_email.encode("ascii")
+            super().send(to_email, message)
+
+    queue_email(session, "jürgen@example.com", "Subject", "Body")
+    queue_email(session, "plain@example.com", "Subject", "Body")
+    session.commit()
+
+    # Ошибка одного письма не останавливает доставку остальных
+    transport = AsciiOnlyTransport()
+    assert deliver_pending(session, transport) == 2
+    assert [to_email for to_email, _ in transport.messages] == ["plain@example.com"]
+    failed = session.exec(select(OutboxEmail)).one()
+    assert failed.attempts == 1
+    assert "ascii" in failed.last_error
+
+    # После последней попытки письмо с секретом удаляется
+    failed.attempts = MAIL_MAX_ATTEMPTS - 1
+    failed.next_attempt_at = datetime.now()
+    session.add(failed)
+    session.commit()
+    assert deliver_pending(session, transport) == 1
+    assert session.exec(select(OutboxEmail)).first() is None
+
+    # Оставшиеся от старых версий мёртвые письма чистит воркер
+    queue_email(session, "dead@example.com", "Subject", "Body")
+    session.commit()
+    session.exec(update(OutboxEmail).values(attempts=MAIL_MAX_ATTEMPTS))
+    session.commit()
+    assert purge_dead_emails(session) == 1
+    assert session.exec(select(OutboxEmail)).first() is None
+
+def test_search(user_token):
+    headers = { "Authorization": f"Bearer {user_token}" }
+
+    publisher = client.post("/publishers", json=TEST_PUBLISHER_DATA, headers=headers).json()
+    author = client.post("/authors", json={**TEST_AUTHOR_DATA, "last_name": "Searchable"}, headers=headers).json()
+    book = client.post("/books", json={
+        **TEST_BOOK_DATA,
+        "title": "Searchable Book",
+        "publisher_id": publisher["id"]
+    }, headers=headers).json()
+
+    response = client.get("/search", params={ "q": "searchable" }, headers=headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert book["id"] in [found["id"] for found in result["books"]]
+    assert author["id"] in [found["id"] for found in result["authors"]]
+
+    client.delete(f"/books/{book['id']}", headers=headers)
+    client.delete(f"/authors/{author['id']}", headers=headers)
+    client.delete(f"/publishers/{publisher['id']}", headers=headers)
+
+def test_books_filters(user_token, session: Session):
+    headers = { "Authorization": f"Bearer {user_token}" }
+
+    publisher = client.post("/publishers", json=TEST_PUBLISHER_DATA, headers=headers).json()
+    author = client.post("/authors", json=TEST_AUTHOR_DATA, headers=headers).json()
+    genre = client.post("/genres", json=TEST_GENRE_DATA, headers=headers).json()
+    book = client.post("/books", json={**TEST_BOOK_DATA, "publisher_id": publisher["id"]}, headers=headers).json()
+    other_book = client.post("/books", json={
+        **TEST_BOOK_DATA,
+        "publication_year": 1999,
+        "publisher_id": publisher["id"]
+    }, headers=headers).json()
+    client.post(f"/books/{book['id']}/authors/{author['id']}", headers=headers)
+    client.post(f"/books/{book['id']}/genres/{genre['id']}", headers=headers)
+
+    for params in [{ "genre_id": genre["id"] }, { "author_id": author["id"] }]:
+        response = client.get("/books", params=params, headers=headers)
+        assert response.status_code == 200
+        assert [found["id"] for found in response.json()] == [book["id"]]
+
+    response = client.get("/books", params={ "publisher_id": publisher["id"], "publication_year": 1999 }, headers=headers)
+    assert [found["id"] for found in response.json()] == [other_book["id"]]
+    response = client.get("/books", params={ "genre_id": 10 ** 20 }, headers=headers)
+    assert response.status_code == 422
+
+    # Фильтры используют вторичные индексы
+    plans = {
+        "ix_bookgenre_genre_id": BookFilter(genre_id=genre["id"]),
+        "ix_bookauthor_author_id": BookFilter(author_id=author["id"]),
+        "ix_book_publisher_id": BookFilter(publisher_id=publisher["id"]),
+        "ix_book_publication_year": BookFilter(publication_year=1999)
+    }
+    for index_name, book_filter in plans.items():
+        assert index_name in query_plan(session, book_filter.apply(select(Book)))
+    assert "ix_comment_book_id" in query_plan(session, select(Comment).where(Comment.book_id == book["id"]))
+
+    for book_id in [book["id"], other_book["id"]]:
+        client.delete(f"/books/{book_id}", headers=headers)
+    client.delete(f"/genres/{genre['id']}", headers=headers)
+    client.delete(f"/authors/{author['id']}", headers=headers)
+    client.delete(f"/publishers/{publisher['id']}", headers=headers)
+
+def test_conditional_get(user_token):
+    headers = { "Authorization": f"Bearer {user_token}" }
+
+    response = client.get("/genres/", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get("/genres/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    genre = client.post("/genres", json=TEST_GENRE_DATA, headers=headers).json()
+    response = client.get("/genres/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    # If-Modified-Since с секундной точностью, без зоны и с мусором
+    last_modified = response.headers["Last-Modified"]
+    response = client.get("/genres/", headers={**headers, "If-Modified-Since": last_modified})
+    assert response.status_code == 304
+    response = client.get("/genres/", headers={**headers, "If-Modified-Since": last_modified.replace("GMT", "-0000")})
+    assert response.status_code == 304
+    response = client.get("/genres/", headers={**headers, "If-Modified-Since": "not a date"})
+    assert response.status_code == 200
+
+    # Версия книг зависит и от жанров
+    response = client.get("/books", headers=headers)
+    books_etag = response.headers["ETag"]
+    client.delete(f"/genres/{genre['id']}", headers=headers)
+    response = client.get("/books", headers={**headers, "If-None-Match": books_etag})
+    assert response.status_code == 200
+
+def test_bulk_import(user_token, monkeypatch):
+    headers = { "Authorization": f"Bearer {user_token}" }
+
+    publisher = client.post("/publishers", json=TEST_PUBLISHER_DATA, headers=headers).json()
+    author = client.post("/authors", json=TEST_AUTHOR_DATA, headers=headers).json()
+    genre = client.post("/genres", json=TEST_GENRE_DATA, headers=headers).json()
+
+    rows = [
+        {**TEST_BOOK_DATA, "title": "Bulk Book 1", "publisher_id": publisher["id"], "author_ids": [author["id"]], "genre_ids": [genre["id"]]},
+        {**TEST_BOOK_DATA, "title": "Bulk Book 2", "publisher_id": publisher["id"], "author_ids": [-1]},
+        {"publication_year": 2025},
+        {**TEST_BOOK_DATA, "title": "Bulk Book 3", "publisher_id": publisher["id"]},
+        {**TEST_BOOK_DATA, "title": "x" * 500, "publication_year": 10 ** 12, "publisher_id": publisher["id"]}
+    ]
+    response = client.post("/books/bulk", content="\n".join(json.dumps(row) for row in rows), headers={
+        **headers,
+        "Content-Type": "application/x-ndjson"
+    })
+    assert response.status_code == 200
+    result = response.json()
+    assert [created["index"] for created in result["created"]] == [0, 3]
+    assert [error["index"] for error in result["errors"]] == [1, 2, 4]
+    assert {error["loc"][0] for error in result["errors"][2]["detail"]} == {"title", "publication_year"}
+    assert result["errors"][0]["detail"] == "Author not found"
+
+    response = client.get("/books", params={ "author_id": author["id"] }, headers=headers)
+    assert [book["id"] for book in response.json()] == [result["created"][0]["id"]]
+    response = client.get("/books", params={ "genre_id": genre["id"] }, headers=headers)
+    assert [book["id"] for book in response.json()] == [result["created"][0]["id"]]
+
+    for created in result["created"]:
+        client.delete(f"/books/{created['id']}", headers=headers)
+    client.delete(f"/genres/{genre['id']}", headers=headers)
+    client.delete(f"/authors/{author['id']}", headers=headers)
+    client.delete(f"/publishers/{publisher['id']}", headers=headers)
+
+    # Лимиты проверяются до разбора всего тела
+    monkeypatch.setattr(catalog_router, "BULK_MAX_ROWS", 2)
+    response = client.post("/books/bulk", content="{}\n{}\n{}\n", headers={
+        **headers,
+        "Content-Type": "application/x-ndjson"
+    })
+    assert response.status_code == 413
+    monkeypatch.setattr(catalog_router, "BULK_MAX_BYTES", 10)
+    response = client.post("/books/bulk", json=[{}] * 5, headers=headers)
+    assert response.status_code == 413
+    assert "bytes" in response.json()["detail"]
+
+def test_export(user_token):
+    headers = { "Authorization": f"Bearer {user_token}" }
+
+    publisher = client.post("/publishers", json=TEST_PUBLISHER_DATA, headers=headers).json()
+    author = client.post("/authors", json=TEST_AUTHOR_DATA, headers=headers).json()
+    book = client.post("/books", json={**TEST_BOOK_DATA, "publisher_id": publisher["id"]}, headers=headers).json()
+    client.post(f"/books/{book['id']}/authors/{author['id']}", headers=headers)
+
+    response = client.get("/books/export", headers=headers)
+    assert response.status_code == 200
+    rows = { row["id"]: row for row in map(json.loads, response.text.splitlines()) }
+    assert rows[book["id"]]["publisher"] == publisher["name"]
+    assert rows[book["id"]]["authors"] == [f"{author['first_name']} {author['last_name']}"]
+    assert rows[book["id"]]["created_at"] == book["created_at"]
+
+    response = client.get("/books/export", params={ "format": "csv" }, headers=headers)
+    assert response.status_code == 200
+    rows = { int(row["id"]): row for row in csv.DictReader(io.StringIO(response.text)) }
+    assert rows[book["id"]]["title"] == book["title"]
+    assert rows[book["id"]]["created_at"] == book["created_at"]
+
+    client.delete(f"/books/{book['id']}", headers=headers)
+    client.delete(f"/authors/{author['id']}", headers=headers)
+    client.delete(f"/publishers/{publisher['id']}", headers=headers)
+
+def test_metrics(user_token):
+    response = client.get("/genres/", headers={ "Authorization": f"Bearer {user_token}" })
+    assert response.status_code == 200
+    assert 'db;desc="' in response.headers["Server-Timing"]
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'http_requests_total{method="GET",route="/genres/",status="200"}' in response.text
+    assert 'db_queries_per_request_count{method="GET",route="/genres/"}' in response.text
+
+    # Необработанное исключение тоже попадает в метрики как 500
+    def broken_session():
+        raise RuntimeError("database is gone")
+
+    app.dependency_overrides[get_async_session] = broken_session
+    try:
+        response = TestClient(app, raise_server_exceptions=False).get("/genres/", headers={ "Authorization": f"Bearer {user_token}" })
+    finally:
+        app.dependency_overrides.pop(get_async_session)
+    assert response.status_code == 500
+    response = client.get("/metrics")
+    assert 'http_requests_total{method="GET",route="/genres/",status="500"}' in response.text
+
+def test_book_ratings(user_token):
+    headers = { "Authorization": f"Bearer {user_token}" }
+
+    publisher = client.post("/publishers", json=TEST_PUBLISHER_DATA, headers=headers).json()
+    book = client.post("/books", json={**TEST_BOOK_DATA, "publisher_id": publisher["id"]}, headers=headers).json()
+    other_book = client.post("/books", json={**TEST_BOOK_DATA, "publisher_id": publisher["id"]}, headers=headers).json()
+
+    client.post(f"/books/{book['id']}/comments", json={ "comment_text": "Good", "rating": 5 }, headers=headers)
+    client.post(f"/books/{book['id']}/comments", json={ "comment_text": "Fine", "rating": 3 }, headers=headers)
+    comment = client.post(f"/books/{other_book['id']}/comments", json={ "comment_text": "Bad", "rating": 1 }, headers=headers).json()
+    client.post(f"/books/{other_book['id']}/comments", json={ "comment_text": "Great", "rating": 5 }, headers=headers)
+
+    books = { found["id"]: found for found in client.get("/books", params={ "publisher_id": publisher["id"] }, headers=headers).json() }
+    assert books[book["id"]]["average_rating"] == 4
+    assert books[other_book["id"]]["average_rating"] == 3
+    assert books[book["id"]]["approved_comment_count"] == 2
+
+    # Удаление комментария по жалобе пересчитывает рейтинг
+    report = client.post(f"/comments/{comment['id']}/reports", json={ "reason_text": "Spam" }, headers=headers).json()
+    response = client.post(f"/reports/{report['id']}/approve", headers=headers)
+    assert response.status_code == 200
+
+    # Пересчёт при миграции восстанавливает агрегаты из одобренных комментариев
+    with Session(engine) as migration_session:
+        migration_session.exec(update(Book).where(Book.id == book["id"]).values(
+            average_rating=0.0, rating_count=0, rating_sum=0, approved_comment_count=0
+        ))
+        recompute_book_ratings(migration_session.connection())
+        migration_session.commit()
+    listed = client.get("/books/batch", params={ "ids": book["id"] }, headers=headers).json()["items"][0]
+    assert (listed["average_rating"], listed["rating_count"], listed["approved_comment_count"]) == (4, 2, 2)
+
+    params = { "publisher_id": publisher["id"], "sort": "-average_rating", "limit": 1 }
+    response = client.get("/books", params=params, headers=headers)
+    assert [found["id"] for found in response.json()] == [other_book["id"]]
+    assert response.json()[0]["average_rating"] == 5
+    response = client.get("/books", params={**params, "cursor": response.headers["X-Next-Cursor"]}, headers=headers)
+    assert [found["id"] for found in response.json()] == [book["id"]]
+
+    for key in [["5", 1], [True, 1], [5.0, True], [5.0, 2 ** 63], [None, 1]]:
+        response = client.get("/books", params={**params, "cursor": encode_cursor(key)}, headers=headers)
+        assert response.status_code == 400
+
+    for book_id in [book["id"], other_book["id"]]:
+        client.delete(f"/books/{book_id}", headers=headers)
+    client.delete(f"/publishers/{publisher['id']}", headers=headers)
+
+def test_book_comments(user_token):
+    headers = { "Authorization": f"Bearer {user_token}" }
+
+    publisher = client.post("/publishers", json=TEST_PUBLISHER_DATA, headers=headers).json()
+    book = client.post("/books", json={**TEST_BOOK_DATA, "publisher_id": publisher["id"]}, headers=headers).json()
+    comment_ids = []
+    for i in range(5):
+        comment = client.post(f"/books/{book['id']}/comments", json={ "comment_text": f"Comment {i}" }, headers=headers).json()
+        comment_ids.append(comment["id"])
+
+    response = client.get("/books", params={ "publisher_id": publisher["id"], "comments": 2 }, headers=headers)
+    listed = response.json()[0]
+    assert listed["comment_count"] == 5
+    assert [comment["id"] for comment in listed["comments"]] == comment_ids[:-3:-1]
+
+    response = client.get("/books", params={ "publisher_id": publisher["id"], "comments": 0 }, headers=headers)
+    assert response.json()[0]["comments"] == []
+    assert response.json()[0]["comment_count"] == 5
+
+    seen = []
+    params = { "limit": 2 }
+    while True:
+        response = client.get(f"/books/{book['id']}/comments", params=params, headers=headers)
+        assert response.status_code == 200
+        seen.extend(comment["id"] for comment in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params = { "limit": 2, "cursor": response.headers["X-Next-Cursor"] }
+    assert seen == comment_ids
+
+    assert client.get("/books/0/comments", headers=headers).status_code == 404
+
+    client.delete(f"/books/{book['id']}", headers=headers)
+    client.delete(f"/publishers/{publisher['id']}", headers=headers)
+
+def test_sparse_fields(user_token):
+    headers = { "Authorization": f"Bearer {user_token}" }
+
+    publisher = client.post("/publishers", json=TEST_PUBLISHER_DATA, headers=headers).json()
+    book = client.post("/books", json={**TEST_BOOK_DATA, "publisher_id": publisher["id"]}, headers=headers).json()
+
+    # Только запрошенные колонки, id добавляется всегда
+    response = client.get("/books", params={ "publisher_id": publisher["id"], "fields": "title,image_url" }, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == [{ "id": book["id"], "title": book["title"], "image_url": book["image_url"] }]
+
+    response = client.get(
+        "/books",
+        params={ "publisher_id": publisher["id"], "fields": "title", "include": "publisher,comments" },
+        headers=headers
+    )
+    listed = response.json()[0]
+    assert set(listed) == {"id", "title", "publisher", "comments", "comment_count"}
+    assert listed["publisher"]["id"] == publisher["id"]
+
+    response = client.get("/publishers/", params={ "fields": "name", "include": "books", "limit": 100 }, headers=headers)
+    listed = next(item for item in response.json() if item["id"] == publisher["id"])
+    assert listed == { "id": publisher["id"], "name": publisher["name"], "books": [{ "id": book["id"], "title": book["title"] }] }
+
+    # Одна колонка в выборке не должна превращать строки в скаляры
+    for path, params in [
+        ("/books", { "publisher_id": publisher["id"] }),
+        ("/books/batch", { "ids": book["id"] }),
+        ("/publishers/", { "limit": 100 }),
+        ("/publishers/batch", { "ids": publisher["id"] })
+    ]:
+        for fields in ["id", ""]:
+            response = client.get(path, params={**params, "fields": fields}, headers=headers)
+            assert response.status_code == 200
+            items = response.json()["items"] if path.endswith("batch") else response.json()
+            assert all(set(item) == {"id"} for item in items) and items
+
+    assert client.get("/books", params={ "fields": "rating_sum" }, headers=headers).status_code == 400
+    assert client.get("/authors/", params={ "include": "comments" }, headers=headers).status_code == 400
+
+    client.delete(f"/books/{book['id']}", headers=headers)
+    client.delete(f"/publishers/{publisher['id']}", headers=headers)
+
+def test_batch_get(user_token):
+    headers = { "Authorization": f"Bearer {user_token}" }
+
+    publisher = client.post("/publishers", json=TEST_PUBLISHER_DATA, headers=headers).json()
+    books = [
+        client.post("/books", json={**TEST_BOOK_DATA, "publisher_id": publisher["id"]}, headers=headers).json()
+        for _ in range(3)
+    ]
+    missing_id = books[-1]["id"] + 1000
+
+    # Порядок ответа совпадает с порядком запроса, отсутствующие id перечислены отдельно
+    ids = [books[2]["id"], missing_id, books[0]["id"]]
+    response = client.get("/books/batch", params={ "ids": ",".join(map(str, ids)) }, headers=headers)
+    assert response.status_code == 200
+    assert [book["id"] for book in response.json()["items"]] == [books[2]["id"], books[0]["id"]]
+    assert response.json()["items"][0]["publisher"]["id"] == publisher["id"]
+    assert response.json()["missing"] == [missing_id]
+
+    response = client.get("/publishers/batch", params={ "ids": f"{publisher['id']}", "include": "books" }, headers=headers)
+    assert [book["id"] for book in response.json()["items"][0]["books"]] == [book["id"] for book in books]
+
+    assert client.get("/genres/batch", params={ "ids": "1,x" }, headers=headers).status_code == 400
+    assert client.get("/books/batch", params={ "ids": "99999999999999999999" }, headers=headers).status_code == 400
+
+    for book in books:
+        client.delete(f"/books/{book['id']}", headers=headers)
+    client.delete(f"/publishers/{publisher['id']}", headers=headers)
+
+def test_token_lifecycle(session: Session):
+    response = client.post("/register", data=TEST_USER_DATA)
+    assert response.status_code == 200
+    credentials = { "username": TEST_USER_DATA["email"], "password": TEST_USER_DATA["password"] }
+
+    tokens = [client.post("/login", data=credentials).json()["access_token"] for _ in range(MAX_SESSIONS_PER_USER + 1)]
+    user = session.exec(select(User).where(User.email == TEST_USER_DATA["email"])).first()
+    active = session.exec(select(Token.token).where(Token.user_id == user.id)).all()
+    assert set(active) == set(tokens[1:])
+    assert client.get("/user", headers={ "Authorization": f"Bearer {tokens[0]}" }).status_code == 401
+
+    # Просроченный токен отклоняется и удаляется фоновой очисткой
+    expired = session.exec(select(Token).where(Token.token == tokens[-1])).first()
+    expired.expires_at = datetime.now() - timedelta(seconds=1)
+    session.add(expired)
+    session.commit()
+    token_cache.clear()
+    assert client.get("/user", headers={ "Authorization": f"Bearer {tokens[-1]}" }).status_code == 401
+    assert client.get("/user", headers={ "Authorization": f"Bearer {tokens[-2]}" }).status_code == 200
+
+    assert purge_expired_tokens(session, batch_size=1) >= 1
+    assert session.exec(select(Token).where(Token.token == tokens[-1])).first() is None
+
+    session.delete(user)
+    session.commit()
+
+def test_signed_tokens(user_token, session: Session, monkeypatch):
+    monkeypatch.setattr(signed_tokens, "AUTH_SECRET_KEY", "test-secret")
+    monkeypatch.setattr(login_router, "SIGNED_TOKENS", True)
+
+    other_user_data = {**TEST_USER_DATA, "email": "signed@example.com"}
+    assert client.post("/register", data=other_user_data).status_code == 200
+    response = client.post("/login", data={ "username": other_user_data["email"], "password": other_user_data["password"] })
+    signed_token = response.json()["access_token"]
+    signed_headers = { "Authorization": f"Bearer {signed_token}" }
+
+    # Подписанный токен проверяется без обращения к таблице token
+    with count_queries() as statements:
+        assert client.get("/books", params={ "limit": 1 }, headers=signed_headers).status_code == 200
+    assert not any("token" in statement for statement in statements)
+
+    payload, _, signature = signed_token.partition(".")
+    assert client.get("/books", headers={ "Authorization": f"Bearer {payload}.{signature[:-2]}xx" }).status_code == 401
+
+    other_user = session.exec(select(User).where(User.email == other_user_data["email"])).first()
+    response = client.post(f"/users/{other_user.id}/block", headers={ "Authorization": f"Bearer {user_token}" })
+    assert response.status_code == 200
+    assert client.get("/books", headers=signed_headers).status_code == 401
+
+    session.refresh(other_user)
+    session.delete(other_user)
+    session.commit()
+    signed_tokens.revocations.clear()
+
+def test_legacy_password_rehash(session: Session):
+    legacy_user = User(
+        first_name="Legacy",
+        last_name="User",
+        email="legacy@example.com",
+        password=sha256(b"legacy-password").hexdigest()
+    )
+    session.add(legacy_user)
+    session.commit()
+
+    # Старый хэш SHA-256 принимается и заменяется на текущий KDF при входе
+    response = client.post("/login", data={ "username": legacy_user.email, "password": "legacy-password" })
+    assert response.status_code == 200
+    session.refresh(legacy_user)
+    assert legacy_user.password.startswith(f"{password_hasher.algorithm}$")
+    assert not password_needs_rehash(legacy_user.password)
+
+    assert client.post("/login", data={ "username": legacy_user.email, "password": "legacy-password" }).status_code == 200
+    assert client.post("/login", data={ "username": legacy_user.email, "password": "wrong" }).status_code == 401
+
+    session.delete(legacy_user)
+    session.commit()
+
+def test_bulk_moderation(user_token, session: Session):
+    headers = { "Authorization": f"Bearer {user_token}" }
+    reader_data = {**TEST_USER_DATA, "email": "reader@example.com"}
+    assert client.post("/register", data=reader_data).status_code == 200
+    reader_token = client.post("/login", data={ "username": reader_data["email"], "password": reader_data["password"] }).json()["access_token"]
+    reader_headers = { "Authorization": f"Bearer {reader_token}" }
+
+    publisher = client.post("/publishers", json=TEST_PUBLISHER_DATA, headers=headers).json()
+    book = client.post("/books", json={**TEST_BOOK_DATA, "publisher_id": publisher["id"]}, headers=headers).json()
+    pending = [
+        client.post(f"/books/{book['id']}/comments", json={ "comment_text": "Pending", "rating": rating }, headers=reader_headers).json()
+        for rating in [2, 4, None]
+    ]
+    approved = client.post(f"/books/{book['id']}/comments", json={ "comment_text": "Approved", "rating": 3 }, headers=headers).json()
+    missing_id = approved["id"] + 1000
+
+    # Результат возвращается по каждому id в порядке запроса
+    ids = [pending[0]["id"], approved["id"], missing_id, pending[1]["id"], pending[2]["id"]]
+    response = client.post("/comments/approve", json={ "ids": ids }, headers=headers)
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == [
+        "approved", "already_approved", "not_found", "approved", "approved"
+    ]
+    listed = client.get("/books/batch", params={ "ids": book["id"] }, headers=headers).json()["items"][0]
+    assert listed["approved_comment_count"] == 4
+    assert listed["rating_count"] == 3
+    assert listed["average_rating"] == 3
+
+    reports = [
+        client.post(f"/comments/{comment['id']}/reports", json={ "reason_text": "Spam" }, headers=reader_headers).json()
+        for comment in [pending[0], approved]
+    ]
+    response = client.post("/reports/reject", json={ "ids": [reports[1]["id"]] }, headers=headers)
+    assert response.json()["results"] == [{ "id": reports[1]["id"], "status": "rejected" }]
+    response = client.post("/reports/approve", json={ "ids": [reports[0]["id"], reports[1]["id"]] }, headers=headers)
+    assert [result["status"] for result in response.json()["results"]] == ["approved", "already_resolved"]
+
+    response = client.post("/comments/reject", json={ "ids": [pending[2]["id"], pending[0]["id"]] }, headers=headers)
+    assert [result["status"] for result in response.json()["results"]] == ["rejected", "not_found"]
+    listed = client.get("/books/batch", params={ "ids": book["id"] }, headers=headers).json()["items"][0]
+    assert listed["approved_comment_count"] == 2
+    assert listed["average_rating"] == 3.5
+
+    # Повторное одобрение одного комментария не учитывает оценку дважды
+    extra = client.post(f"/books/{book['id']}/comments", json={ "comment_text": "Late", "rating": 5 }, headers=reader_headers).json()
+    for _ in range(2):
+        assert client.post(f"/comments/{extra['id']}/approve", headers=headers).status_code == 200
+    listed = client.get("/books/batch", params={ "ids": book["id"] }, headers=headers).json()["items"][0]
+    assert listed["approved_comment_count"] == 3
+    assert listed["average_rating"] == 4
+    assert client.post(f"/comments/{missing_id}/approve", headers=headers).status_code == 404
+
+    assert client.post("/comments/approve", json={ "ids": ids }, headers=reader_headers).status_code == 403
+    assert client.post("/comments/approve", json={ "ids": [10 ** 20] }, headers=headers).status_code == 422
+
+    client.delete(f"/books/{book['id']}", headers=headers)
+    client.delete(f"/publishers/{publisher['id']}", headers=headers)
+    session.delete(session.exec(select(User).where(User.email == reader_data["email"])).first())
+    session.commit()
+
+def test_moderation_queue(user_token, session: Session):
+    headers = { "Authorization": f"Bearer {user_token}" }
+    reader_data = {**TEST_USER_DATA, "email": "queue@example.com"}
+    assert client.post("/register", data=reader_data).status_code == 200
+    reader_token = client.post("/login", data={ "username": reader_data["email"], "password": reader_data["password"] }).json()["access_token"]
+    reader_headers = { "Authorization": f"Bearer {reader_token}" }
+
+    publisher = client.post("/publishers", json=TEST_PUBLISHER_DATA, headers=headers).json()
+    book = client.post("/books", json={**TEST_BOOK_DATA, "publisher_id": publisher["id"]}, headers=headers).json()
+    comments = [
+        client.post(f"/books/{book['id']}/comments", json={ "comment_text": f"Pending {i}" }, headers=reader_headers).json()
+        for i in range(3)
+    ]
+    reports = [
+        client.post(f"/comments/{comment['id']}/reports", json={ "reason_text": "Spam" }, headers=headers).json()
+        for comment in comments
+    ]
+
+    # Очереди модерации отдаются постранично с курсором
+    for path, expected in [("/reports/", reports), ("/comments/pending", comments)]:
+        seen = []
+        params = { "book_id": book["id"], "limit": 2 }
+        while True:
+            response = client.get(path, params=params, headers=headers)
+            assert response.status_code == 200
+            seen.extend(item["id"] for item in response.json())
+            if "X-Next-Cursor" not in response.headers:
+                break
+            params = { "book_id": book["id"], "limit": 2, "cursor": response.headers["X-Next-Cursor"] }
+        assert seen == [item["id"] for item in expected]
+
+    response = client.get("/reports/", params={ "comment_id": comments[1]["id"] }, headers=headers)
+    assert [report["id"] for report in response.json()] == [reports[1]["id"]]
+    assert client.get("/comments/pending", headers=reader_headers).status_code == 403
+
+    assert "ix_report_unresolved" in query_plan(session, select(Report).where(Report.resolved_at == None).order_by(Report.id))
+    assert "ix_comment_pending" in query_plan(session, select(Comment).where(Comment.is_approved == False).order_by(Comment.id))
+
+    client.delete(f"/books/{book['id']}", headers=headers)
+    client.delete(f"/publishers/{publisher['id']}", headers=headers)
+    session.delete(session.exec(select(User).where(User.email == reader_data["email"])).first())
+    session.commit()
+
+def test_add_column_ddl():
+    # "user" - зарезервированное слово в PostgreSQL
+    ddl = add_column_ddl(User.__table__.c.is_active, postgresql.dialect())
+    assert ddl.startswith('ALTER TABLE "user" ADD is_active')
+
+def test_signed_tokens_require_secret():
+    # Ошибка конфигурации видна при запуске, а не на каждом /login
+    env = {**os.environ, "SIGNED_TOKENS": "true", "AUTH_SECRET_KEY": ""}
+    result = subprocess.run(
+        [sys.executable, "-c", "import config"],
+        cwd=Path(__file__).parent, env=env, capture_output=True, text=True
+    )
+    assert result.returncode != 0
+    assert "AUTH_SECRET_KEY" in result.stderr
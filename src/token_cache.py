@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from typing import Optional
+from time import monotonic
+
+from config import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL
+from orm.user import User
+
+class TokenCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return user
+
+    def set(self, token: str, user: User, token_expires_at: Optional[datetime] = None):
+        ttl = self.ttl
+        if token_expires_at is not None:
+            ttl = min(ttl, (token_expires_at - datetime.now()).total_seconds())
+        if self.max_size <= 0 or ttl <= 0:
+            return
+        snapshot = User(**user.model_dump(exclude={"password"}))
+        with self._lock:
+            self._entries[token] = (monotonic() + ttl, snapshot)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_token(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in [t for t, (_, user) in self._entries.items() if user.id == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
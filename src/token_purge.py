@@ -0,0 +1,45 @@
+from datetime import datetime
+import logging
+from threading import Event, Thread
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session, delete, or_, select
+
+from config import TOKEN_PURGE_BATCH_SIZE, TOKEN_PURGE_INTERVAL
+from db import engine
+from orm.token import Token
+
+logger = logging.getLogger(__name__)
+
+def purge_expired_tokens(session: Session, batch_size=TOKEN_PURGE_BATCH_SIZE):
+    purged = 0
+    while True:
+        expired = (
+            select(Token.id)
+            .where(or_(Token.expires_at < datetime.now(), Token.expires_at == None))
+            .limit(batch_size)
+        )
+        deleted = session.exec(delete(Token).where(Token.id.in_(expired))).rowcount
+        session.commit()
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+
+class TokenPurgeWorker(Thread):
+    def __init__(self):
+        super().__init__(name="token-purge", daemon=True)
+        self.stopping = Event()
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                with Session(engine) as session:
+                    purged = purge_expired_tokens(session)
+                if purged:
+                    logger.info("Purged %s expired tokens", purged)
+            except SQLAlchemyError:
+                logger.exception("Failed to purge expired tokens")
+            self.stopping.wait(TOKEN_PURGE_INTERVAL)
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import sha1
+from fastapi import Request, Response
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from orm.table_version import TableVersion
+
+CACHE_CONTROL = "private, no-cache"
+
+async def bump_versions(session: AsyncSession, *models):
+    dialect = session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    now = datetime.now()
+    for model in models:
+        statement = insert(TableVersion).values(name=model.__tablename__, version=1, updated_at=now)
+        await session.exec(statement.on_conflict_do_update(
+            index_elements=[TableVersion.name],
+            set_={ "version": TableVersion.version + 1, "updated_at": now }
+        ))
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+async def conditional_response(request: Request, response: Response, session: AsyncSession, models, *variant):
+    names = sorted(model.__tablename__ for model in models)
+    versions = { version.name: version for version in (await session.exec(
+        select(TableVersion).where(TableVersion.name.in_(names))
+    )).all() }
+
+    stamp = [(name, versions[name].version if name in versions else 0) for name in names]
+    etag = '"' + sha1(repr((stamp, request.url.path, str(request.url.query), variant)).encode("utf-8")).hexdigest() + '"'
+    last_modified = max(
+        (version.updated_at for version in versions.values()),
+        default=datetime.fromtimestamp(0)
+    ).astimezone(timezone.utc)
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": CACHE_CONTROL,
+        "Vary": "Authorization"
+    }
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None